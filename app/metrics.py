@@ -0,0 +1,233 @@
+import os
+import re
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+
+# Latency buckets in seconds, from sub-millisecond cursor checkouts to slow recomputes.
+BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+HELP = {
+    "http_request_duration_seconds": "Time from request line to last byte written, per route.",
+    "http_response_bytes_total": "Response body bytes written, per route.",
+    "json_serialize_duration_seconds": "json.dumps + encode time for API responses, per route.",
+    "db_connect_duration_seconds": "Time to obtain a database cursor (includes opening the file once).",
+    "db_query_duration_seconds": "DuckDB execute time, keyed by normalized SQL.",
+    "recompute_phase_duration_seconds": "Time spent in each phase of the recommendation recompute.",
+    "cache_requests_total": "Cache lookups by cache and result (hit/miss).",
+}
+
+_lock = threading.Lock()
+_histograms = {}
+_counters = {}
+
+
+def _key(labels):
+    return tuple(sorted(labels.items()))
+
+
+def observe(name, seconds, **labels):
+    with _lock:
+        series = _histograms.setdefault(name, {})
+        hist = series.get(_key(labels))
+        if hist is None:
+            hist = series[_key(labels)] = [[0] * len(BUCKETS), 0.0, 0]
+        for i, bound in enumerate(BUCKETS):
+            if seconds <= bound:
+                hist[0][i] += 1
+        hist[1] += seconds
+        hist[2] += 1
+
+
+def inc(name, amount=1, **labels):
+    with _lock:
+        series = _counters.setdefault(name, {})
+        series[_key(labels)] = series.get(_key(labels), 0) + amount
+
+
+def record_cache(cache, hit):
+    inc("cache_requests_total", cache=cache, result="hit" if hit else "miss")
+
+
+@contextmanager
+def timer(name, **labels):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(name, time.perf_counter() - started, **labels)
+
+
+_WS = re.compile(r"\s+")
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r"\b\d+(?:\.\d+)?\b")
+
+
+def normalize_sql(sql, limit=160):
+    sql = _STRING.sub("?", sql)
+    sql = _NUMBER.sub("?", sql)
+    sql = _WS.sub(" ", sql).strip()
+    return sql if len(sql) <= limit else sql[: limit - 3] + "..."
+
+
+class TimedCursor:
+    """Wraps a DuckDB cursor so every execute() lands in db_query_duration_seconds."""
+
+    def __init__(self, cursor):
+        self._cursor = cursor
+
+    def execute(self, sql, params=None):
+        started = time.perf_counter()
+        try:
+            if params is None:
+                return self._cursor.execute(sql)
+            return self._cursor.execute(sql, params)
+        finally:
+            observe("db_query_duration_seconds", time.perf_counter() - started, sql=normalize_sql(sql))
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self._cursor.close()
+        return False
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(key, extra=()):
+    pairs = list(key) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in pairs) + "}"
+
+
+def render():
+    """Prometheus text exposition format (version 0.0.4)."""
+    lines = []
+    with _lock:
+        for name in sorted(_histograms):
+            lines.append(f"# HELP {name} {HELP.get(name, name)}")
+            lines.append(f"# TYPE {name} histogram")
+            for key, (buckets, total, count) in sorted(_histograms[name].items()):
+                for bound, n in zip(BUCKETS, buckets):
+                    lines.append(f"{name}_bucket{_labels(key, [('le', bound)])} {n}")
+                lines.append(f"{name}_bucket{_labels(key, [('le', '+Inf')])} {count}")
+                lines.append(f"{name}_sum{_labels(key)} {total:.6f}")
+                lines.append(f"{name}_count{_labels(key)} {count}")
+        for name in sorted(_counters):
+            lines.append(f"# HELP {name} {HELP.get(name, name)}")
+            lines.append(f"# TYPE {name} counter")
+            for key, value in sorted(_counters[name].items()):
+                lines.append(f"{name}{_labels(key)} {value}")
+    return "\n".join(lines) + "\n"
+
+
+class SlowRequestProfiler:
+    """Samples the stacks of in-flight requests and dumps the slow ones as folded stacks.
+
+    Output files contain `frame;frame;frame count` lines, the input format of
+    flamegraph.pl and speedscope. Off unless PROFILE_SLOW_MS is set or it is
+    switched on through POST /api/profiler.
+    """
+
+    # Below this every ordinary request would be dumped.
+    MIN_THRESHOLD_MS = 50.0
+
+    def __init__(self, threshold_ms=None, interval_ms=5.0, out_dir=None, max_files=200):
+        self.threshold_ms = None if threshold_ms is None else max(self.MIN_THRESHOLD_MS, threshold_ms)
+        self.interval = interval_ms / 1000.0
+        self.out_dir = Path(out_dir or Path(tempfile.gettempdir()) / "planning-profiles")
+        self.max_files = max(1, max_files)
+        self._active = {}
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = None
+
+    @property
+    def enabled(self):
+        return self.threshold_ms is not None
+
+    def configure(self, enabled, threshold_ms=None):
+        if not enabled:
+            self.threshold_ms = None
+        elif threshold_ms is not None:
+            self.threshold_ms = max(self.MIN_THRESHOLD_MS, float(threshold_ms))
+        elif self.threshold_ms is None:
+            self.threshold_ms = 250.0
+
+    @contextmanager
+    def sample(self):
+        if not self.enabled:
+            yield None
+            return
+        tid = threading.get_ident()
+        stacks = Counter()
+        with self._lock:
+            self._active[tid] = stacks
+            self._wake.set()
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="profiler", daemon=True)
+                self._thread.start()
+        try:
+            yield stacks
+        finally:
+            with self._lock:
+                self._active.pop(tid, None)
+
+    def _run(self):
+        # Sleeps on _wake while no request is being sampled, so a profiler that
+        # was switched off (or is idle) costs nothing.
+        while True:
+            self._wake.wait()
+            time.sleep(self.interval)
+            with self._lock:
+                if not self._active:
+                    self._wake.clear()
+                    continue
+                frames = sys._current_frames()
+                for tid, stacks in self._active.items():
+                    frame = frames.get(tid)
+                    if frame is not None:
+                        stacks[_fold(frame)] += 1
+
+    def maybe_dump(self, stacks, route, seconds):
+        if not stacks or self.threshold_ms is None or seconds * 1000 < self.threshold_ms:
+            return None
+        self.out_dir.mkdir(parents=True, exist_ok=True)
+        stamp = datetime.now().strftime("%Y%m%dT%H%M%S.%f")
+        slug = re.sub(r"[^A-Za-z0-9]+", "_", route).strip("_") or "root"
+        path = self.out_dir / f"{stamp}_{int(seconds * 1000)}ms_{slug}.folded"
+        path.write_text("".join(f"{stack} {n}\n" for stack, n in stacks.most_common()), encoding="utf-8")
+        # Names start with the timestamp: keep the newest max_files dumps.
+        for stale in sorted(self.out_dir.glob("*.folded"))[: -self.max_files]:
+            stale.unlink(missing_ok=True)
+        return path
+
+
+def _fold(frame):
+    names = []
+    while frame is not None:
+        code = frame.f_code
+        names.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+        frame = frame.f_back
+    return ";".join(reversed(names))
+
+
+_threshold = os.environ.get("PROFILE_SLOW_MS")
+PROFILER = SlowRequestProfiler(
+    threshold_ms=float(_threshold) if _threshold else None,
+    interval_ms=float(os.environ.get("PROFILE_INTERVAL_MS", "5")),
+    out_dir=os.environ.get("PROFILE_DIR"),
+    max_files=int(os.environ.get("PROFILE_MAX_FILES", "200")),
+)
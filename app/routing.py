@@ -0,0 +1,322 @@
+import heapq
+import json
+import math
+import os
+from array import array
+from pathlib import Path
+
+ROOT_DIR = Path(__file__).resolve().parent.parent
+ROADS_PATH = ROOT_DIR / "map-data" / "raw" / "roads.geojson"
+GRAPH_DIR = ROOT_DIR / "map-data" / "graph"
+
+# highway=* values that are not traversable for each mode, plus the access tag
+# that can forbid it explicitly. Oneway is ignored: pedestrians and cyclists
+# (walking the bike) may use a street in either direction.
+EXCLUDED_HIGHWAYS = {
+    "walk": {"motorway", "motorway_link", "trunk", "trunk_link", "construction", "proposed", "raceway"},
+    "cycle": {"motorway", "motorway_link", "trunk", "trunk_link", "construction", "proposed", "raceway", "steps"},
+}
+MODE_ACCESS_TAG = {"walk": "foot", "cycle": "bicycle"}
+MODES = tuple(EXCLUDED_HIGHWAYS)
+
+KM_PER_DEG_LAT = 110.574
+KM_PER_DEG_LON_EQUATOR = 111.320
+SNAP_CELL_DEG = 0.001
+GRAPH_FORMAT = 1
+
+
+def _key(lat, lon):
+    return (round(lat * 1e7) << 32) | (round(lon * 1e7) & 0xFFFFFFFF)
+
+
+def _unkey(key):
+    lon_e7 = key & 0xFFFFFFFF
+    if lon_e7 >= 1 << 31:
+        lon_e7 -= 1 << 32
+    return (key >> 32) / 1e7, lon_e7 / 1e7
+
+
+def segment_km(lat1, lon1, lat2, lon2):
+    # Equirectangular approximation: well under 0.1% off for street-length segments.
+    dx = (lon2 - lon1) * KM_PER_DEG_LON_EQUATOR * math.cos(math.radians((lat1 + lat2) / 2))
+    dy = (lat2 - lat1) * KM_PER_DEG_LAT
+    return math.sqrt(dx * dx + dy * dy)
+
+
+def iter_road_features(path):
+    """Features from newline-delimited GeoJSON, or from a legacy FeatureCollection file."""
+    with open(path, "r", encoding="utf-8") as f:
+        head = f.read(64).lstrip()
+        f.seek(0)
+        if head.startswith("{") and '"FeatureCollection"' in head:
+            yield from json.load(f).get("features", [])
+            return
+        for line in f:
+            line = line.strip()
+            if line:
+                yield json.loads(line)
+
+
+def usable(props, mode):
+    highway = props.get("highway")
+    if not highway or highway in EXCLUDED_HIGHWAYS[mode]:
+        return False
+    if props.get("access") in ("no", "private") and props.get(MODE_ACCESS_TAG[mode]) not in ("yes", "designated"):
+        return False
+    return props.get(MODE_ACCESS_TAG[mode]) != "no"
+
+
+class RoadGraph:
+    """Undirected road graph in CSR form.
+
+    Only intersections and way ends become nodes; the street geometry in between
+    is folded into the edge length, which keeps the graph a fraction of the raw
+    coordinate count. `lat`/`lon` hold node positions, the neighbours of node u
+    are `targets[offsets[u]:offsets[u + 1]]` with lengths (km) in `weights`.
+    """
+
+    def __init__(self, mode, lat, lon, offsets, targets, weights, source=None):
+        self.mode = mode
+        self.lat = lat
+        self.lon = lon
+        self.offsets = offsets
+        self.targets = targets
+        self.weights = weights
+        self.source = source or {}
+        self._grid = None
+
+    @property
+    def node_count(self):
+        return len(self.lat)
+
+    @property
+    def edge_count(self):
+        return len(self.targets) // 2
+
+    @classmethod
+    def build(cls, roads_path, mode="walk"):
+        if mode not in MODES:
+            raise ValueError(f"Unknown travel mode: {mode}")
+        ways = []
+        uses = {}
+        for feature in iter_road_features(roads_path):
+            geom = feature.get("geometry") or {}
+            if geom.get("type") != "LineString" or not usable(feature.get("properties") or {}, mode):
+                continue
+            keys = [_key(lat, lon) for lon, lat in geom["coordinates"]]
+            if len(keys) < 2:
+                continue
+            ways.append(keys)
+            for k in keys:
+                uses[k] = uses.get(k, 0) + 1
+            # Way ends are always nodes, even when nothing else touches them.
+            uses[keys[0]] += 1
+            uses[keys[-1]] += 1
+
+        node_ids = {}
+        lat = array("d")
+        lon = array("d")
+        src, dst, length = [], [], []
+
+        def node(k):
+            idx = node_ids.get(k)
+            if idx is None:
+                idx = node_ids[k] = len(lat)
+                k_lat, k_lon = _unkey(k)
+                lat.append(k_lat)
+                lon.append(k_lon)
+            return idx
+
+        for keys in ways:
+            start = keys[0]
+            prev_lat, prev_lon = _unkey(start)
+            acc = 0.0
+            for k in keys[1:]:
+                k_lat, k_lon = _unkey(k)
+                acc += segment_km(prev_lat, prev_lon, k_lat, k_lon)
+                prev_lat, prev_lon = k_lat, k_lon
+                if uses[k] >= 2:
+                    if k != start:
+                        a, b = node(start), node(k)
+                        src.append(a)
+                        dst.append(b)
+                        length.append(acc)
+                    start = k
+                    acc = 0.0
+
+        n = len(lat)
+        degree = [0] * (n + 1)
+        for a, b in zip(src, dst):
+            degree[a] += 1
+            degree[b] += 1
+        offsets = array("q", [0]) * (n + 1)
+        total = 0
+        for u in range(n):
+            offsets[u] = total
+            total += degree[u]
+        offsets[n] = total
+        fill = list(offsets[:n])
+        targets = array("q", [0]) * total
+        weights = array("d", [0.0]) * total
+        for a, b, w in zip(src, dst, length):
+            targets[fill[a]] = b
+            weights[fill[a]] = w
+            fill[a] += 1
+            targets[fill[b]] = a
+            weights[fill[b]] = w
+            fill[b] += 1
+
+        stat = os.stat(roads_path)
+        source = {"path": str(roads_path), "size": stat.st_size, "mtime": stat.st_mtime}
+        return cls(mode, lat, lon, offsets, targets, weights, source)
+
+    # -- persistence -------------------------------------------------------
+
+    _ARRAYS = ("lat", "lon", "offsets", "targets", "weights")
+
+    def save(self, out_dir):
+        out_dir = Path(out_dir)
+        out_dir.mkdir(parents=True, exist_ok=True)
+        for name in self._ARRAYS:
+            with (out_dir / f"{name}.bin").open("wb") as f:
+                getattr(self, name).tofile(f)
+        meta = {
+            "format": GRAPH_FORMAT,
+            "mode": self.mode,
+            "nodes": self.node_count,
+            "edge_slots": len(self.targets),
+            "source": self.source,
+        }
+        (out_dir / "meta.json").write_text(json.dumps(meta, indent=2), encoding="utf-8")
+
+    @classmethod
+    def load(cls, in_dir):
+        in_dir = Path(in_dir)
+        meta = json.loads((in_dir / "meta.json").read_text(encoding="utf-8"))
+        sizes = {"lat": meta["nodes"], "lon": meta["nodes"], "offsets": meta["nodes"] + 1}
+        arrays = {}
+        for name, typecode in zip(cls._ARRAYS, ("d", "d", "q", "q", "d")):
+            arr = array(typecode)
+            with (in_dir / f"{name}.bin").open("rb") as f:
+                arr.fromfile(f, sizes.get(name, meta["edge_slots"]))
+            arrays[name] = arr
+        return cls(meta["mode"], source=meta["source"], **arrays), meta
+
+    # -- queries -----------------------------------------------------------
+
+    def _main_component(self):
+        seen = bytearray(self.node_count)
+        best = []
+        offsets, targets = self.offsets, self.targets
+        for root in range(self.node_count):
+            if seen[root]:
+                continue
+            seen[root] = 1
+            component = [root]
+            for u in component:
+                for i in range(offsets[u], offsets[u + 1]):
+                    v = targets[i]
+                    if not seen[v]:
+                        seen[v] = 1
+                        component.append(v)
+            if len(component) > len(best):
+                best = component
+        return best
+
+    def snap(self, lat, lon, max_km=1.0):
+        """Nearest node of the main connected component: (node, offset_km) or (None, None)."""
+        if self._grid is None:
+            # Only the largest component is indexed, so a point is never snapped
+            # onto an isolated fragment (a private yard, a ferry pier).
+            self._grid = {}
+            for u in self._main_component():
+                cell = (int(self.lat[u] // SNAP_CELL_DEG), int(self.lon[u] // SNAP_CELL_DEG))
+                self._grid.setdefault(cell, []).append(u)
+        row, col = int(lat // SNAP_CELL_DEG), int(lon // SNAP_CELL_DEG)
+        best, best_km = None, None
+        cell_km = SNAP_CELL_DEG * min(KM_PER_DEG_LAT, KM_PER_DEG_LON_EQUATOR * math.cos(math.radians(lat)))
+        max_ring = int(max_km / cell_km) + 1
+        for ring in range(max_ring + 1):
+            for r in range(row - ring, row + ring + 1):
+                for c in range(col - ring, col + ring + 1):
+                    if max(abs(r - row), abs(c - col)) != ring:
+                        continue
+                    for u in self._grid.get((r, c), ()):
+                        d = segment_km(lat, lon, self.lat[u], self.lon[u])
+                        if best_km is None or d < best_km:
+                            best, best_km = u, d
+            # Anything in a further ring is at least `ring` whole cells away.
+            if best_km is not None and best_km <= ring * cell_km:
+                break
+        if best_km is None or best_km > max_km:
+            return None, None
+        return best, best_km
+
+    def multi_source(self, sources, limit_km=math.inf):
+        """Dijkstra from many sources at once.
+
+        sources: iterable of (node, start_km, label). Returns (dist, label) lists
+        indexed by node: the network distance to the closest source and its label.
+        """
+        n = self.node_count
+        dist = [math.inf] * n
+        label = [None] * n
+        heap = []
+        for node, start_km, lab in sources:
+            if start_km < dist[node]:
+                dist[node] = start_km
+                label[node] = lab
+                heap.append((start_km, node))
+        heapq.heapify(heap)
+        offsets, targets, weights = self.offsets, self.targets, self.weights
+        pop, push = heapq.heappop, heapq.heappush
+        while heap:
+            d, u = pop(heap)
+            if d > dist[u]:
+                continue
+            lu = label[u]
+            for i in range(offsets[u], offsets[u + 1]):
+                nd = d + weights[i]
+                v = targets[i]
+                if nd < dist[v] and nd <= limit_km:
+                    dist[v] = nd
+                    label[v] = lu
+                    push(heap, (nd, v))
+        return dist, label
+
+    def from_node(self, source, limit_km):
+        """Bounded single-source Dijkstra: {node: km} for everything within limit_km."""
+        dist = {source: 0.0}
+        heap = [(0.0, source)]
+        offsets, targets, weights = self.offsets, self.targets, self.weights
+        pop, push = heapq.heappop, heapq.heappush
+        while heap:
+            d, u = pop(heap)
+            if d > dist[u]:
+                continue
+            for i in range(offsets[u], offsets[u + 1]):
+                nd = d + weights[i]
+                v = targets[i]
+                if nd <= limit_km and nd < dist.get(v, math.inf):
+                    dist[v] = nd
+                    push(heap, (nd, v))
+        return dist
+
+
+def load_or_build(mode="walk", roads_path=ROADS_PATH, graph_dir=GRAPH_DIR):
+    """Return the cached graph for mode, rebuilding it when roads.geojson changed."""
+    cache = Path(graph_dir) / mode
+    stat = os.stat(roads_path)
+    if (cache / "meta.json").exists():
+        graph, meta = RoadGraph.load(cache)
+        src = meta.get("source", {})
+        if (
+            meta.get("format") == GRAPH_FORMAT
+            and src.get("path") == str(roads_path)
+            and src.get("size") == stat.st_size
+            and src.get("mtime") == stat.st_mtime
+        ):
+            return graph, False
+    graph = RoadGraph.build(roads_path, mode)
+    graph.save(cache)
+    return graph, True
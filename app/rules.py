@@ -0,0 +1,214 @@
+import string
+from functools import lru_cache
+
+# Placeholders a reason_template may use per scope, and the column each one reads.
+PLACEHOLDERS = {
+    "school": {
+        "name": "name",
+        "util_pct": "utilization_pct",
+        "condition": "condition_score",
+        "enrolled": "enrolled_estimate",
+        "capacity": "capacity_total",
+    },
+    "school_pair": {
+        "name": "name",
+        "other_name": "other_name",
+        "util_pct": "utilization_pct",
+        "other_util_pct": "other_utilization_pct",
+        "distance_km": "distance_km",
+    },
+    "district": {
+        "deficit": "ABS(surplus_deficit)",
+        "demand": "demand_total",
+        "capacity": "capacity_total",
+    },
+}
+
+OUTPUT_COLUMNS = "year, scenario_id, district_id, school_id, action_type, reason, impact_students, impact_capacity"
+
+HAVERSINE_KM = """
+  2 * 6371.0 * atan2(
+    sqrt(pow(sin(radians(b.y_lat - a.y_lat) / 2), 2)
+         + cos(radians(a.y_lat)) * cos(radians(b.y_lat)) * pow(sin(radians(b.x_lon - a.x_lon) / 2), 2)),
+    sqrt(1 - pow(sin(radians(b.y_lat - a.y_lat) / 2), 2)
+         - cos(radians(a.y_lat)) * cos(radians(b.y_lat)) * pow(sin(radians(b.x_lon - a.x_lon) / 2), 2))
+  )"""
+
+
+def load_rules(con, constraint_id):
+    """Enabled rules of a constraint set as a hashable tuple, ordered by priority."""
+    return tuple(
+        con.execute(
+            """
+            SELECT rule_id, scope::VARCHAR, action_type::VARCHAR, priority, max_utilization_pct,
+                   below_min_condition, min_deficit_classes, reason_template
+            FROM recommendation_rules
+            WHERE constraint_id = ? AND enabled
+            ORDER BY priority, rule_id
+            """,
+            [constraint_id],
+        ).fetchall()
+    )
+
+
+def sql_literal(value):
+    return "'" + str(value).replace("'", "''") + "'"
+
+
+def compile_reason(template, scope):
+    """Turn a str.format-style template into a SQL string expression."""
+    fields = PLACEHOLDERS[scope]
+    parts = []
+    for literal, field, spec, conversion in string.Formatter().parse(template):
+        if literal:
+            parts.append(sql_literal(literal))
+        if field is None:
+            continue
+        if field not in fields or conversion:
+            raise ValueError(f"Unknown placeholder {{{field}}} in {scope} rule; use one of {', '.join(fields)}")
+        if not spec:
+            parts.append(f"CAST({fields[field]} AS VARCHAR)")
+        elif spec.startswith(".") and spec.endswith("f") and spec[1:-1].isdigit():
+            parts.append(f"printf('%{spec}', {fields[field]})")
+        else:
+            raise ValueError(f"Unsupported format spec :{spec} in {scope} rule; use :.<digits>f")
+    return " || ".join(parts) or "''"
+
+
+def _number(value):
+    return repr(float(value))
+
+
+def _school_rule(rank, rule):
+    _, _, action, _, max_util, below_min_condition, _, template = rule
+    where = ["TRUE"]
+    if max_util is not None:
+        where.append(f"utilization_pct < {_number(max_util)}")
+    if below_min_condition:
+        where.append("condition_score < c.min_condition_score")
+    return f"""
+    SELECT {rank} AS rule_rank, year, scenario_id, district_id, school_id, {sql_literal(action)} AS action_type,
+           {compile_reason(template, 'school')} AS reason,
+           enrolled_estimate AS impact_students, -capacity_total AS impact_capacity
+    FROM s, c
+    WHERE {' AND '.join(where)}"""
+
+
+def _pair_rule(rank, rule):
+    _, _, action, _, max_util, _, _, template = rule
+    where = ["distance_km < c.max_distance_km"]
+    if max_util is not None:
+        where.append(f"utilization_pct < {_number(max_util)} AND other_utilization_pct < {_number(max_util)}")
+    return f"""
+    SELECT {rank} AS rule_rank, year, scenario_id, district_id, school_id, {sql_literal(action)} AS action_type,
+           {compile_reason(template, 'school_pair')} AS reason,
+           enrolled_estimate + other_enrolled_estimate AS impact_students,
+           -(LEAST(capacity_total, other_capacity_total) // 2) AS impact_capacity
+    FROM pairs, c
+    WHERE {' AND '.join(where)}"""
+
+
+def _district_rules(rank, rules):
+    # One CASE per output column keeps the rules exclusive: a district gets the
+    # first (lowest priority) rule it matches, like an if/elif chain.
+    conditions = [f"surplus_deficit < -(c.class_size_max * {_number(rule[6] or 0)})" for rule in rules]
+    action = " ".join(f"WHEN {cond} THEN {sql_literal(rule[2])}" for cond, rule in zip(conditions, rules))
+    reason = " ".join(
+        f"WHEN {cond} THEN {compile_reason(rule[7], 'district')}" for cond, rule in zip(conditions, rules)
+    )
+    return f"""
+    SELECT * FROM (
+      SELECT {rank} AS rule_rank, year, scenario_id, district_id, NULL AS school_id,
+             CASE {action} END AS action_type,
+             CASE {reason} END AS reason,
+             ABS(surplus_deficit) AS impact_students, ABS(surplus_deficit) AS impact_capacity
+      FROM d, c
+    )
+    WHERE action_type IS NOT NULL"""
+
+
+@lru_cache(maxsize=32)
+def compile_rules(rules, scope_sql, network=False):
+    """Compile rules into one INSERT INTO recommendations ... SELECT.
+
+    scope_sql filters year/scenario_id (e.g. "year = $year"); the statement also
+    takes $constraint_id, plus $mode when network is true, i.e. when
+    school_network_snap exists and pair distances should come from the road graph.
+    """
+    selects = []
+    district = []
+    pair_thresholds = []
+    for rank, rule in enumerate(rules):
+        scope = rule[1]
+        if scope == "school":
+            selects.append(_school_rule(rank, rule))
+        elif scope == "school_pair":
+            selects.append(_pair_rule(rank, rule))
+            pair_thresholds.append(rule[4])
+        elif scope == "district":
+            district.append(rule)
+        else:
+            raise ValueError(f"Unknown rule scope: {scope}")
+    if district:
+        rank = next(i for i, rule in enumerate(rules) if rule[1] == "district")
+        selects.append(_district_rules(rank, district))
+    if not selects:
+        return None
+
+    ctes = [
+        "c AS (SELECT * FROM constraints WHERE constraint_id = $constraint_id)",
+        f"""s AS (
+    SELECT su.year, su.scenario_id, sc.school_id, sc.district_id, sc.name, sc.x_lon, sc.y_lat,
+           sc.capacity_total, sc.condition_score, su.enrolled_estimate, su.utilization_pct
+    FROM school_utilization su
+    JOIN schools sc ON sc.school_id = su.school_id
+    WHERE sc.status = 'active' AND {scope_sql}
+  )""",
+        f"d AS (SELECT * FROM district_capacity WHERE {scope_sql})",
+    ]
+    if pair_thresholds:
+        # Candidate pairs share year, scenario and district. Great-circle distance is
+        # never shorter than the latitude difference, which makes a cheap band filter
+        # before the trigonometry; it also bounds the network distance from below.
+        prefilter = ""
+        if None not in pair_thresholds:
+            limit = _number(max(pair_thresholds))
+            prefilter = f"AND a.utilization_pct < {limit} AND b.utilization_pct < {limit}"
+        distance = HAVERSINE_KM
+        joins = ""
+        if network:
+            # Only pairs within --pair-km are stored, so a missing pair of two snapped
+            # schools is too far apart (NULL, never merged); unsnapped schools use
+            # straight-line distance.
+            ctes.append("routed AS (SELECT school_id FROM school_network_snap WHERE mode = $mode)")
+            joins = """
+    LEFT JOIN routed ra ON ra.school_id = a.school_id
+    LEFT JOIN routed rb ON rb.school_id = b.school_id
+    LEFT JOIN school_network_distance n
+      ON n.mode = $mode AND n.school_a = a.school_id AND n.school_b = b.school_id"""
+            distance = (
+                "CASE WHEN ra.school_id IS NOT NULL AND rb.school_id IS NOT NULL "
+                f"THEN n.distance_km ELSE {HAVERSINE_KM} END"
+            )
+        ctes.append(
+            f"""pairs AS (
+    SELECT a.year, a.scenario_id, a.district_id, a.school_id, a.name, a.enrolled_estimate, a.capacity_total,
+           a.utilization_pct, b.name AS other_name, b.enrolled_estimate AS other_enrolled_estimate,
+           b.capacity_total AS other_capacity_total, b.utilization_pct AS other_utilization_pct,
+           {distance} AS distance_km
+    FROM s a
+    JOIN s b
+      ON b.year = a.year AND b.scenario_id = a.scenario_id AND b.district_id = a.district_id
+     AND b.school_id > a.school_id {prefilter}
+    CROSS JOIN c{joins}
+    WHERE radians(ABS(b.y_lat - a.y_lat)) * 6371.0 < c.max_distance_km
+  )"""
+        )
+
+    return f"""
+INSERT INTO recommendations ({OUTPUT_COLUMNS})
+WITH {', '.join(ctes)}
+SELECT {OUTPUT_COLUMNS}
+FROM ({' UNION ALL '.join(selects)})
+ORDER BY year, scenario_id, rule_rank, district_id, school_id
+"""
@@ -2,10 +2,12 @@
 import csv
 import io
 import json
-import math
 import os
 import posixpath
 import re
+import sys
+import threading
+import time
 from datetime import datetime
 from http import HTTPStatus
 from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
@@ -19,10 +21,39 @@ except Exception as exc:
         "DuckDB is required. Install with: pip install duckdb"
     ) from exc
 
+import metrics
+import rules
+
 ROOT_DIR = Path(__file__).resolve().parent.parent
-DB_PATH = ROOT_DIR / "data" / "data.db"
+DB_PATH = Path(os.environ.get("DB_PATH", ROOT_DIR / "data" / "data.db"))
 WEB_DIR = ROOT_DIR / "web"
-PMTILES_PATH = WEB_DIR / "tiles" / "goteborg.pmtiles"
+PMTILES_PATH = Path(os.environ.get("PMTILES_PATH", WEB_DIR / "tiles" / "goteborg.pmtiles"))
+# Network distances come from scripts/build_road_graph.py --mode <TRAVEL_MODE>.
+TRAVEL_MODE = os.environ.get("TRAVEL_MODE", "walk")
+
+# Metric labels come only from these sets, so requests to other paths or with
+# other methods cannot grow the number of series.
+METRIC_ROUTES = frozenset(
+    {
+        "/api/health",
+        "/api/metrics",
+        "/api/districts",
+        "/api/map/district-balance",
+        "/api/schools",
+        "/api/forecast",
+        "/api/kpis",
+        "/api/district-capacity",
+        "/api/school-utilization",
+        "/api/recommendations",
+        "/api/recommendations/run",
+        "/api/recommendation-rules",
+        "/api/constraints",
+        "/api/export",
+        "/api/profiler",
+        "/tiles/goteborg.pmtiles",
+    }
+)
+HTTP_METHODS = frozenset({"GET", "HEAD", "POST", "PATCH", "PUT", "DELETE", "OPTIONS"})
 
 
 class ApiError(Exception):
@@ -32,10 +63,21 @@ class ApiError(Exception):
         super().__init__(message)
 
 
+_db = None
+_db_lock = threading.Lock()
+
+
 def get_db():
+    # Opening the database file costs more than any API query, so the process
+    # keeps one instance and hands each caller its own cursor.
+    global _db
     if not DB_PATH.exists():
         raise ApiError(f"Database not found at {DB_PATH}. Run scripts/build_db.py first.", 500)
-    return duckdb.connect(str(DB_PATH), read_only=False)
+    with metrics.timer("db_connect_duration_seconds"):
+        with _db_lock:
+            if _db is None:
+                _db = duckdb.connect(str(DB_PATH), read_only=False)
+        return metrics.TimedCursor(_db.cursor())
 
 
 def as_int(params, key, default=None):
@@ -55,15 +97,18 @@ def as_text(params, key, default=None):
     return value
 
 
-def haversine_km(lat1, lon1, lat2, lon2):
-    r = 6371.0
-    phi1 = math.radians(lat1)
-    phi2 = math.radians(lat2)
-    dphi = math.radians(lat2 - lat1)
-    dlambda = math.radians(lon2 - lon1)
-    a = math.sin(dphi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(dlambda / 2) ** 2
-    c = 2 * math.atan2(math.sqrt(a), math.sqrt(1 - a))
-    return r * c
+_scenario_ids = None
+
+
+def as_scenario(params, key="scenario_id", default="base"):
+    global _scenario_ids
+    value = as_text(params, key, default)
+    metrics.record_cache("scenario_ids", _scenario_ids is not None)
+    if _scenario_ids is None:
+        _scenario_ids = {row[0] for row in query_rows("SELECT unnest(enum_range(NULL::scenario_code))")[0]}
+    if value not in _scenario_ids:
+        raise ApiError(f"Unknown scenario: {value}")
+    return value
 
 
 def query_rows(sql, args=None):
@@ -98,206 +143,182 @@ def fetch_constraints():
     return data[0]
 
 
-def build_capacity_and_utilization(year, scenario):
-    with get_db() as con:
-        con.execute("DELETE FROM district_capacity WHERE year = ? AND scenario_id = ?", [year, scenario])
-        con.execute("DELETE FROM school_utilization WHERE year = ? AND scenario_id = ?", [year, scenario])
+def recompute_scope(year=None, scenario=None, prefix=""):
+    """WHERE clause and named parameters for one year/scenario; None means all of them."""
+    clauses = []
+    params = {}
+    if year is not None:
+        clauses.append(f"{prefix}year = $year")
+        params["year"] = year
+    if scenario is not None:
+        clauses.append(f"{prefix}scenario_id = CAST($scenario AS scenario_code)")
+        params["scenario"] = scenario
+    return " AND ".join(clauses) or "TRUE", params
 
-        district_rows = con.execute(
-            """
+
+def build_capacity_and_utilization(year=None, scenario=None):
+    scope, params = recompute_scope(year, scenario)
+    if year is not None and scenario is not None:
+        pairs = "SELECT $year AS year, CAST($scenario AS scenario_code) AS scenario_id"
+    else:
+        pairs = f"SELECT DISTINCT year, scenario_id FROM forecast WHERE {scope}"
+
+    with get_db() as con:
+        started = time.perf_counter()
+        con.execute(f"DELETE FROM district_capacity WHERE {scope}", params)
+        con.execute(f"DELETE FROM school_utilization WHERE {scope}", params)
+
+        con.execute(
+            f"""
+            INSERT INTO district_capacity (district_id, year, scenario_id, capacity_total, demand_total, surplus_deficit)
+            WITH pairs AS ({pairs}),
+            capacity AS (
+              SELECT y.year, s.district_id, SUM(s.capacity_total) AS capacity_total
+              FROM (SELECT DISTINCT year FROM pairs) y
+              JOIN schools s
+                ON s.status = 'active'
+               AND (s.opened_year IS NULL OR s.opened_year <= y.year)
+               AND (s.closed_year IS NULL OR s.closed_year >= y.year)
+              GROUP BY y.year, s.district_id
+            )
             SELECT
               d.district_id,
-              COALESCE(SUM(s.capacity_total), 0) AS capacity_total,
-              COALESCE(f.expected_students, 0) AS demand_total
-            FROM districts d
-            LEFT JOIN schools s
-              ON s.district_id = d.district_id
-             AND s.status = 'active'
-             AND (s.opened_year IS NULL OR s.opened_year <= ?)
-             AND (s.closed_year IS NULL OR s.closed_year >= ?)
+              p.year,
+              p.scenario_id,
+              COALESCE(c.capacity_total, 0),
+              COALESCE(f.expected_students, 0),
+              COALESCE(c.capacity_total, 0) - COALESCE(f.expected_students, 0)
+            FROM pairs p
+            CROSS JOIN districts d
+            LEFT JOIN capacity c
+              ON c.year = p.year
+             AND c.district_id = d.district_id
             LEFT JOIN forecast f
               ON f.district_id = d.district_id
-             AND f.year = ?
-             AND f.scenario_id = ?
-            GROUP BY d.district_id, f.expected_students
+             AND f.year = p.year
+             AND f.scenario_id = p.scenario_id
+            ORDER BY p.year, p.scenario_id, d.district_id
             """,
-            [year, year, year, scenario],
-        ).fetchall()
-
-        for district_id, capacity_total, demand_total in district_rows:
-            surplus_deficit = int(capacity_total) - int(demand_total)
-            con.execute(
-                """
-                INSERT INTO district_capacity (district_id, year, scenario_id, capacity_total, demand_total, surplus_deficit)
-                VALUES (?, ?, ?, ?, ?, ?)
-                """,
-                [district_id, year, scenario, int(capacity_total), int(demand_total), surplus_deficit],
+            params,
+        )
+        metrics.observe("recompute_phase_duration_seconds", time.perf_counter() - started, phase="district_capacity")
+
+        # Each school gets the district's demand in proportion to its share of the
+        # capacity. ROUND_EVEN matches Python's round().
+        started = time.perf_counter()
+        con.execute(
+            f"""
+            INSERT INTO school_utilization (school_id, year, scenario_id, enrolled_estimate, utilization_pct)
+            SELECT school_id, year, scenario_id, enrolled, COALESCE(enrolled / capacity_total * 100, 0.0)
+            FROM (
+              SELECT
+                s.school_id,
+                dc.year,
+                dc.scenario_id,
+                s.capacity_total,
+                CASE
+                  WHEN COALESCE(s.capacity_total, 0) = 0 OR COALESCE(dc.capacity_total, 0) = 0 THEN 0
+                  ELSE CAST(ROUND_EVEN(dc.demand_total * (s.capacity_total / dc.capacity_total), 0) AS INTEGER)
+                END AS enrolled
+              FROM schools s
+              JOIN district_capacity dc
+                ON dc.district_id = s.district_id
+              WHERE s.status = 'active'
+                AND (s.opened_year IS NULL OR s.opened_year <= dc.year)
+                AND (s.closed_year IS NULL OR s.closed_year >= dc.year)
+                AND {recompute_scope(year, scenario, "dc.")[0]}
             )
-
-        school_rows = con.execute(
-            """
-            SELECT
-              s.school_id,
-              s.district_id,
-              s.capacity_total,
-              dc.capacity_total AS district_capacity,
-              dc.demand_total AS district_demand
-            FROM schools s
-            JOIN district_capacity dc
-              ON dc.district_id = s.district_id
-             AND dc.year = ?
-             AND dc.scenario_id = ?
-            WHERE s.status = 'active'
-              AND (s.opened_year IS NULL OR s.opened_year <= ?)
-              AND (s.closed_year IS NULL OR s.closed_year >= ?)
+            ORDER BY year, scenario_id, school_id
             """,
-            [year, scenario, year, year],
-        ).fetchall()
-
-        for school_id, _, capacity, district_capacity, district_demand in school_rows:
-            if not capacity or not district_capacity:
-                enrolled = 0
-                util_pct = 0.0
-            else:
-                enrolled = int(round(district_demand * (capacity / district_capacity)))
-                util_pct = (enrolled / capacity) * 100
-
-            con.execute(
-                """
-                INSERT INTO school_utilization (school_id, year, scenario_id, enrolled_estimate, utilization_pct)
-                VALUES (?, ?, ?, ?, ?)
-                """,
-                [school_id, year, scenario, enrolled, util_pct],
-            )
+            params,
+        )
+        metrics.observe("recompute_phase_duration_seconds", time.perf_counter() - started, phase="school_utilization")
 
 
-def build_recommendations(year, scenario):
-    c = fetch_constraints()
-    class_size = c["class_size_max"]
-    max_distance = c["max_distance_km"]
-    min_condition = c["min_condition_score"]
+def has_network_distances(con):
+    return bool(
+        con.execute(
+            """
+            SELECT COUNT(*) FROM duckdb_tables()
+            WHERE database_name = current_database() AND table_name = 'school_network_snap'
+            """
+        ).fetchone()[0]
+    )
 
-    build_capacity_and_utilization(year, scenario)
 
-    with get_db() as con:
-        con.execute("DELETE FROM recommendations WHERE year = ? AND scenario_id = ?", [year, scenario])
+def network_pair_km(con):
+    """Largest school-school distance stored for TRAVEL_MODE, or None if not routed."""
+    try:
+        return con.execute("SELECT MIN(pair_km) FROM school_network_snap WHERE mode = ?", [TRAVEL_MODE]).fetchone()[0]
+    except duckdb.CatalogException:
+        return None
 
-        schools = con.execute(
-            """
-            SELECT
-              s.school_id,
-              s.district_id,
-              s.name,
-              s.x_lon,
-              s.y_lat,
-              s.capacity_total,
-              s.condition_score,
-              su.enrolled_estimate,
-              su.utilization_pct
-            FROM schools s
-            JOIN school_utilization su
-              ON su.school_id = s.school_id
-             AND su.year = ?
-             AND su.scenario_id = ?
-            WHERE s.status = 'active'
-            """,
-            [year, scenario],
-        ).fetchall()
 
-        districts = con.execute(
-            """
-            SELECT district_id, surplus_deficit, demand_total
-            FROM district_capacity
-            WHERE year = ? AND scenario_id = ?
-            """,
-            [year, scenario],
-        ).fetchall()
+def pair_km_warnings(con, max_distance_km):
+    pair_km = network_pair_km(con)
+    if pair_km is None or max_distance_km is None or max_distance_km <= pair_km:
+        return []
+    return [
+        f"max_distance_km {max_distance_km:g} exceeds the {pair_km:g} km of stored {TRAVEL_MODE} distances; "
+        f"farther school pairs are not merged until scripts/build_road_graph.py --mode {TRAVEL_MODE} is rerun."
+    ]
 
-        recs = []
 
-        # Close rule
-        for school_id, district_id, name, _, _, capacity, condition, enrolled, util_pct in schools:
-            if util_pct < 40 and condition < min_condition:
-                recs.append(
-                    {
-                        "district_id": district_id,
-                        "school_id": school_id,
-                        "action_type": "close",
-                        "reason": f"Låg beläggning ({util_pct:.1f}%) och svagt skick ({condition}).",
-                        "impact_students": int(enrolled),
-                        "impact_capacity": -int(capacity),
-                    }
-                )
+def require_constraint(con, constraint_id):
+    if not con.execute("SELECT COUNT(*) FROM constraints WHERE constraint_id = ?", [constraint_id]).fetchone()[0]:
+        raise ApiError(f"Unknown constraint_id '{constraint_id}'.", 400)
 
-        # Merge rule
-        by_district = {}
-        for row in schools:
-            by_district.setdefault(row[1], []).append(row)
-
-        for district_id, district_schools in by_district.items():
-            for i in range(len(district_schools)):
-                a = district_schools[i]
-                for j in range(i + 1, len(district_schools)):
-                    b = district_schools[j]
-                    if a[8] < 55 and b[8] < 55:
-                        distance = haversine_km(a[4], a[3], b[4], b[3])
-                        if distance < max_distance:
-                            recs.append(
-                                {
-                                    "district_id": district_id,
-                                    "school_id": a[0],
-                                    "action_type": "merge",
-                                    "reason": f"Sammanslagning med {b[2]}: låg beläggning och avstånd {distance:.2f} km.",
-                                    "impact_students": int(a[7] + b[7]),
-                                    "impact_capacity": -int(min(a[5], b[5]) // 2),
-                                }
-                            )
-
-        # New build or resize rule
-        for district_id, surplus_deficit, demand_total in districts:
-            if surplus_deficit < -(class_size * 4):
-                recs.append(
-                    {
-                        "district_id": district_id,
-                        "school_id": None,
-                        "action_type": "new_build",
-                        "reason": f"Kapacitetsunderskott {abs(surplus_deficit)} elever i distriktet.",
-                        "impact_students": int(abs(surplus_deficit)),
-                        "impact_capacity": int(abs(surplus_deficit)),
-                    }
-                )
-            elif surplus_deficit < -class_size:
-                recs.append(
-                    {
-                        "district_id": district_id,
-                        "school_id": None,
-                        "action_type": "resize",
-                        "reason": f"Mindre underskott {abs(surplus_deficit)} elever i distriktet.",
-                        "impact_students": int(abs(surplus_deficit)),
-                        "impact_capacity": int(abs(surplus_deficit)),
-                    }
-                )
 
-        for idx, rec in enumerate(recs, start=1):
-            rec_id = f"rec_{year}_{scenario}_{idx}"
-            con.execute(
-                """
-                INSERT INTO recommendations
-                  (rec_id, year, scenario_id, district_id, school_id, action_type, reason, impact_students, impact_capacity, status)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, 'proposed')
-                """,
-                [
-                    rec_id,
-                    year,
-                    scenario,
-                    rec["district_id"],
-                    rec["school_id"],
-                    rec["action_type"],
-                    rec["reason"],
-                    rec["impact_students"],
-                    rec["impact_capacity"],
-                ],
+def build_recommendations(year=None, scenario=None, constraint_id="default"):
+    """Recompute capacity, utilization and recommendations; None covers every year/scenario.
+
+    Returns a list of warnings for the caller to pass on.
+    """
+    scope, params = recompute_scope(year, scenario)
+    with get_db() as con:
+        try:
+            rule_set = rules.load_rules(con, constraint_id)
+        except duckdb.CatalogException:
+            rule_set = ()
+        if not rule_set:
+            require_constraint(con, constraint_id)
+            raise ApiError(
+                f"No recommendation rules for constraint set '{constraint_id}' "
+                "(older databases: run scripts/migrate_schema.py).",
+                500,
             )
+        network = has_network_distances(con)
+        hits = rules.compile_rules.cache_info().hits
+        try:
+            sql = rules.compile_rules(rule_set, scope, network)
+        except ValueError as exc:
+            raise ApiError(f"Invalid recommendation rule: {exc}", 500) from exc
+        metrics.record_cache("compiled_rules", rules.compile_rules.cache_info().hits > hits)
+        max_distance_km = con.execute(
+            "SELECT max_distance_km FROM constraints WHERE constraint_id = ?", [constraint_id]
+        ).fetchone()
+        warnings = pair_km_warnings(con, max_distance_km and max_distance_km[0]) if network else []
+
+    build_capacity_and_utilization(year, scenario)
+
+    with get_db() as con:
+        started = time.perf_counter()
+        rule_params = dict(params, constraint_id=constraint_id)
+        if network:
+            rule_params["mode"] = TRAVEL_MODE
+        # rec_id comes from rec_id_seq and status defaults to 'proposed'.
+        con.execute("BEGIN TRANSACTION")
+        try:
+            con.execute(f"DELETE FROM recommendations WHERE {scope}", params)
+            con.execute(sql, rule_params)
+            con.execute("COMMIT")
+        except Exception:
+            con.execute("ROLLBACK")
+            raise
+        metrics.observe("recompute_phase_duration_seconds", time.perf_counter() - started, phase="rules")
+    for warning in warnings:
+        print(f"warning: {warning}", file=sys.stderr)
+    return warnings
 
 
 def table_to_csv(table_name, where_sql="", args=None):
@@ -316,8 +337,41 @@ class DemoHandler(SimpleHTTPRequestHandler):
     def __init__(self, *args, **kwargs):
         super().__init__(*args, directory=str(WEB_DIR), **kwargs)
 
+    def handle_one_request(self):
+        self._status = None
+        self._bytes_sent = 0
+        started = time.perf_counter()
+        with metrics.PROFILER.sample() as stacks:
+            super().handle_one_request()
+        if self._status is None:
+            return
+        elapsed = time.perf_counter() - started
+        route = self._route()
+        method = self.command if self.command in HTTP_METHODS else "other"
+        metrics.observe(
+            "http_request_duration_seconds", elapsed, route=route, method=method, status=str(self._status)
+        )
+        metrics.inc("http_response_bytes_total", self._bytes_sent, route=route)
+        metrics.PROFILER.maybe_dump(stacks, f"{method} {route}", elapsed)
+
+    def _route(self):
+        path = urlparse(self.path).path
+        if path in METRIC_ROUTES:
+            return path
+        return "unknown" if path.startswith("/api/") else "static"
+
+    def send_response(self, code, message=None):
+        self._status = code
+        super().send_response(code, message)
+
+    def send_header(self, keyword, value):
+        if keyword.lower() == "content-length":
+            self._bytes_sent += int(value)
+        super().send_header(keyword, value)
+
     def _send_json(self, obj, status=200):
-        payload = json.dumps(obj, ensure_ascii=False).encode("utf-8")
+        with metrics.timer("json_serialize_duration_seconds", route=self._route()):
+            payload = json.dumps(obj, ensure_ascii=False).encode("utf-8")
         self.send_response(status)
         self.send_header("Content-Type", "application/json; charset=utf-8")
         self.send_header("Content-Length", str(len(payload)))
@@ -384,7 +438,7 @@ class DemoHandler(SimpleHTTPRequestHandler):
             LEFT JOIN district_capacity dc
               ON dc.district_id = d.district_id
              AND dc.year = ?
-             AND dc.scenario_id = ?
+             AND dc.scenario_id = CAST(? AS scenario_code)
             ORDER BY d.district_id
             """,
             [year, scenario],
@@ -424,13 +478,22 @@ class DemoHandler(SimpleHTTPRequestHandler):
             if path == "/api/health":
                 return self._send_json({"status": "ok", "time": datetime.utcnow().isoformat() + "Z"})
 
+            if path == "/api/metrics":
+                body = metrics.render().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+                return
+
             if path == "/api/districts":
                 data = query_json("SELECT district_id, name, geom_wkt, area_km2 FROM districts ORDER BY district_id")
                 return self._send_json(data)
 
             if path == "/api/map/district-balance":
                 year = as_int(params, "year", 2026)
-                scenario = as_text(params, "scenario_id", "base")
+                scenario = as_scenario(params)
                 return self._send_json(self._district_balance_geojson(year, scenario))
 
             if path == "/api/schools":
@@ -449,11 +512,11 @@ class DemoHandler(SimpleHTTPRequestHandler):
                 return self._send_json(query_json(sql, args))
 
             if path == "/api/forecast":
-                scenario = as_text(params, "scenario_id", "base")
+                scenario = as_scenario(params)
                 district_id = as_text(params, "district_id")
                 sql = (
                     "SELECT district_id, year, scenario_id, expected_students "
-                    "FROM forecast WHERE scenario_id = ?"
+                    "FROM forecast WHERE scenario_id = CAST(? AS scenario_code)"
                 )
                 args = [scenario]
                 if district_id:
@@ -464,10 +527,10 @@ class DemoHandler(SimpleHTTPRequestHandler):
 
             if path == "/api/kpis":
                 year = as_int(params, "year", 2026)
-                scenario = as_text(params, "scenario_id", "base")
+                scenario = as_scenario(params)
                 district_id = as_text(params, "district_id")
 
-                where = "WHERE dc.year = ? AND dc.scenario_id = ?"
+                where = "WHERE dc.year = ? AND dc.scenario_id = CAST(? AS scenario_code)"
                 args = [year, scenario]
                 if district_id:
                     where += " AND dc.district_id = ?"
@@ -489,14 +552,14 @@ class DemoHandler(SimpleHTTPRequestHandler):
 
             if path == "/api/district-capacity":
                 year = as_int(params, "year", 2026)
-                scenario = as_text(params, "scenario_id", "base")
+                scenario = as_scenario(params)
                 return self._send_json(
                     query_json(
                         """
                         SELECT dc.district_id, d.name AS district_name, dc.capacity_total, dc.demand_total, dc.surplus_deficit
                         FROM district_capacity dc
                         JOIN districts d ON d.district_id = dc.district_id
-                        WHERE dc.year = ? AND dc.scenario_id = ?
+                        WHERE dc.year = ? AND dc.scenario_id = CAST(? AS scenario_code)
                         ORDER BY dc.district_id
                         """,
                         [year, scenario],
@@ -505,12 +568,12 @@ class DemoHandler(SimpleHTTPRequestHandler):
 
             if path == "/api/school-utilization":
                 year = as_int(params, "year", 2026)
-                scenario = as_text(params, "scenario_id", "base")
+                scenario = as_scenario(params)
                 district_id = as_text(params, "district_id")
                 sql = (
                     "SELECT su.school_id, s.name AS school_name, s.district_id, su.enrolled_estimate, su.utilization_pct "
                     "FROM school_utilization su JOIN schools s ON s.school_id = su.school_id "
-                    "WHERE su.year = ? AND su.scenario_id = ?"
+                    "WHERE su.year = ? AND su.scenario_id = CAST(? AS scenario_code)"
                 )
                 args = [year, scenario]
                 if district_id:
@@ -521,7 +584,7 @@ class DemoHandler(SimpleHTTPRequestHandler):
 
             if path == "/api/recommendations":
                 year = as_int(params, "year", 2026)
-                scenario = as_text(params, "scenario_id", "base")
+                scenario = as_scenario(params)
                 return self._send_json(
                     query_json(
                         """
@@ -531,7 +594,7 @@ class DemoHandler(SimpleHTTPRequestHandler):
                         FROM recommendations r
                         LEFT JOIN districts d ON d.district_id = r.district_id
                         LEFT JOIN schools s ON s.school_id = r.school_id
-                        WHERE r.year = ? AND r.scenario_id = ?
+                        WHERE r.year = ? AND r.scenario_id = CAST(? AS scenario_code)
                         ORDER BY r.rec_id
                         """,
                         [year, scenario],
@@ -541,15 +604,32 @@ class DemoHandler(SimpleHTTPRequestHandler):
             if path == "/api/constraints":
                 return self._send_json(fetch_constraints())
 
+            if path == "/api/recommendation-rules":
+                constraint_id = as_text(params, "constraint_id", "default")
+                with get_db() as con:
+                    require_constraint(con, constraint_id)
+                return self._send_json(
+                    query_json(
+                        """
+                        SELECT rule_id, scope, action_type, priority, max_utilization_pct,
+                               below_min_condition, min_deficit_classes, reason_template, enabled
+                        FROM recommendation_rules
+                        WHERE constraint_id = ?
+                        ORDER BY priority, rule_id
+                        """,
+                        [constraint_id],
+                    )
+                )
+
             if path == "/api/export":
                 dataset = as_text(params, "dataset", "recommendations")
                 year = as_int(params, "year", 2026)
-                scenario = as_text(params, "scenario_id", "base")
+                scenario = as_scenario(params)
 
                 if dataset not in {"recommendations", "district_capacity", "school_utilization"}:
                     raise ApiError(f"Unsupported export dataset: {dataset}")
 
-                csv_data = table_to_csv(dataset, "WHERE year = ? AND scenario_id = ?", [year, scenario])
+                csv_data = table_to_csv(dataset, "WHERE year = ? AND scenario_id = CAST(? AS scenario_code)", [year, scenario])
                 filename = f"{dataset}_{scenario}_{year}.csv"
                 body = csv_data.encode("utf-8")
                 self.send_response(200)
@@ -572,15 +652,43 @@ class DemoHandler(SimpleHTTPRequestHandler):
         if parsed.path == "/api/recommendations/run":
             try:
                 body = self._read_json()
-                year = int(body.get("year", 2026))
+                # "all" recomputes every year and/or scenario in the forecast in one pass.
+                year = body.get("year", 2026)
+                year = None if year == "all" else int(year)
                 scenario = body.get("scenario_id", "base")
-                build_recommendations(year, scenario)
-                return self._send_json({"status": "ok", "year": year, "scenario_id": scenario})
+                scenario = None if scenario == "all" else as_scenario({"scenario_id": [scenario]})
+                constraint_id = str(body.get("constraint_id", "default"))
+                warnings = build_recommendations(year, scenario, constraint_id)
+                return self._send_json(
+                    {
+                        "status": "ok",
+                        "year": "all" if year is None else year,
+                        "scenario_id": scenario or "all",
+                        "constraint_id": constraint_id,
+                        "warnings": warnings,
+                    }
+                )
             except ApiError as exc:
                 return self._send_json({"error": exc.message}, status=exc.status)
             except Exception as exc:
                 return self._send_json({"error": str(exc)}, status=500)
 
+        if parsed.path == "/api/profiler":
+            try:
+                body = self._read_json()
+                metrics.PROFILER.configure(bool(body.get("enabled", True)), body.get("threshold_ms"))
+                return self._send_json(
+                    {
+                        "enabled": metrics.PROFILER.enabled,
+                        "threshold_ms": metrics.PROFILER.threshold_ms,
+                        "out_dir": str(metrics.PROFILER.out_dir),
+                    }
+                )
+            except ApiError as exc:
+                return self._send_json({"error": exc.message}, status=exc.status)
+            except Exception as exc:
+                return self._send_json({"error": str(exc)}, status=400)
+
         return self._send_json({"error": "Unknown endpoint"}, status=404)
 
     def do_HEAD(self):
@@ -618,8 +726,9 @@ class DemoHandler(SimpleHTTPRequestHandler):
                         """,
                         [class_size, max_distance_km, min_condition],
                     )
+                    warnings = pair_km_warnings(con, max_distance_km)
 
-                return self._send_json({"status": "ok"})
+                return self._send_json({"status": "ok", "warnings": warnings})
             except Exception as exc:
                 return self._send_json({"error": str(exc)}, status=400)
 
@@ -1,3 +1,14 @@
+-- Closed vocabularies are ENUMs (stored as 1-byte codes). DuckDB cannot add labels
+-- to an existing ENUM: after extending one here (e.g. a new scenario_code), run
+-- scripts/migrate_schema.py, which notices the change and rebuilds data.db with
+-- the new type before the new value can be ingested.
+CREATE TYPE scenario_code AS ENUM ('base', 'low', 'high');
+CREATE TYPE action_kind AS ENUM ('close', 'merge', 'new_build', 'resize');
+CREATE TYPE rec_status AS ENUM ('proposed', 'accepted', 'rejected');
+CREATE TYPE rule_scope AS ENUM ('school', 'school_pair', 'district');
+
+CREATE SEQUENCE rec_id_seq;
+
 CREATE TABLE districts (
   district_id        TEXT PRIMARY KEY,
   name               TEXT NOT NULL,
@@ -24,19 +35,21 @@ CREATE TABLE students (
   year               INTEGER,
   district_id        TEXT REFERENCES districts(district_id),
   x_lon              DOUBLE,
-  y_lat              DOUBLE,
-  PRIMARY KEY (student_id, year)
+  y_lat              DOUBLE
+  -- (student_id, year) is unique but deliberately not a PRIMARY KEY: maintaining an
+  -- ART index over the full register makes replacing a year very slow.
+  -- scripts/ingest.py checks uniqueness in bulk instead.
 );
 
 CREATE TABLE scenarios (
-  scenario_id        TEXT PRIMARY KEY,
+  scenario_id        scenario_code PRIMARY KEY,
   name               TEXT NOT NULL
 );
 
 CREATE TABLE forecast (
   district_id        TEXT REFERENCES districts(district_id),
   year               INTEGER,
-  scenario_id        TEXT REFERENCES scenarios(scenario_id),
+  scenario_id        scenario_code REFERENCES scenarios(scenario_id),
   expected_students  INTEGER,
   PRIMARY KEY (district_id, year, scenario_id)
 );
@@ -48,10 +61,27 @@ CREATE TABLE constraints (
   min_condition_score INTEGER
 );
 
+-- Recommendation rules, versioned with the constraint set they belong to and
+-- compiled into a single INSERT ... SELECT by app/rules.py. Unused thresholds
+-- are NULL. District rules are exclusive: the lowest priority that matches wins.
+CREATE TABLE recommendation_rules (
+  constraint_id      TEXT REFERENCES constraints(constraint_id),
+  rule_id            TEXT,
+  scope              rule_scope,
+  action_type        action_kind,
+  priority           INTEGER,
+  max_utilization_pct DOUBLE,
+  below_min_condition BOOLEAN DEFAULT FALSE,
+  min_deficit_classes DOUBLE,
+  reason_template    TEXT,
+  enabled            BOOLEAN DEFAULT TRUE,
+  PRIMARY KEY (constraint_id, rule_id)
+);
+
 CREATE TABLE district_capacity (
   district_id        TEXT REFERENCES districts(district_id),
   year               INTEGER,
-  scenario_id        TEXT REFERENCES scenarios(scenario_id),
+  scenario_id        scenario_code REFERENCES scenarios(scenario_id),
   capacity_total     INTEGER,
   demand_total       INTEGER,
   surplus_deficit    INTEGER,
@@ -61,23 +91,23 @@ CREATE TABLE district_capacity (
 CREATE TABLE school_utilization (
   school_id          TEXT REFERENCES schools(school_id),
   year               INTEGER,
-  scenario_id        TEXT REFERENCES scenarios(scenario_id),
+  scenario_id        scenario_code REFERENCES scenarios(scenario_id),
   enrolled_estimate  INTEGER,
   utilization_pct    DOUBLE,
   PRIMARY KEY (school_id, year, scenario_id)
 );
 
 CREATE TABLE recommendations (
-  rec_id             TEXT PRIMARY KEY,
+  rec_id             BIGINT PRIMARY KEY DEFAULT nextval('rec_id_seq'),
   year               INTEGER,
-  scenario_id        TEXT REFERENCES scenarios(scenario_id),
+  scenario_id        scenario_code REFERENCES scenarios(scenario_id),
   district_id        TEXT REFERENCES districts(district_id),
   school_id          TEXT REFERENCES schools(school_id),
-  action_type        TEXT,
+  action_type        action_kind,
   reason             TEXT,
   impact_students    INTEGER,
   impact_capacity    INTEGER,
-  status             TEXT
+  status             rec_status DEFAULT 'proposed'
 );
 
 CREATE TABLE users (
@@ -88,3 +118,32 @@ CREATE TABLE users (
   password_hash      TEXT,
   active             BOOLEAN DEFAULT TRUE
 );
+
+CREATE TYPE travel_mode AS ENUM ('walk', 'cycle');
+
+-- Filled by scripts/build_road_graph.py from the OSM road network. Every school
+-- snapped to the network has a school_network_snap row; school_network_distance
+-- only holds pairs up to pair_km, so a snapped pair without a row is farther.
+CREATE TABLE school_network_snap (
+  mode               travel_mode,
+  school_id          TEXT REFERENCES schools(school_id),
+  snap_km            DOUBLE,
+  pair_km            DOUBLE,
+  PRIMARY KEY (mode, school_id)
+);
+
+CREATE TABLE school_network_distance (
+  mode               travel_mode,
+  school_a           TEXT REFERENCES schools(school_id),
+  school_b           TEXT REFERENCES schools(school_id),
+  distance_km        DOUBLE,
+  PRIMARY KEY (mode, school_a, school_b)
+);
+
+CREATE TABLE student_network_distance (
+  mode               travel_mode,
+  year               INTEGER,
+  student_id         TEXT,
+  nearest_school_id  TEXT REFERENCES schools(school_id),
+  distance_km        DOUBLE
+);
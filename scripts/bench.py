@@ -0,0 +1,222 @@
+#!/usr/bin/env python3
+import argparse
+import json
+import os
+import platform
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from pathlib import Path
+
+import duckdb
+
+from bench_api import ENDPOINTS, ROOT, start_local_server, summarize, timed_request
+from gen_synthetic import PRESETS, build_database, generate, sizes_for
+
+EXPORT_DATASETS = ["recommendations", "district_capacity", "school_utilization"]
+SCENARIOS = ["base", "low", "high"]
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ["git", "-C", str(ROOT), "rev-parse", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def bench_recompute(db_path, years, repeat):
+    """Time the two recompute phases in-process, once per (year, scenario), then a full recompute."""
+    sys.path.insert(0, str(ROOT / "app"))
+    import server
+
+    server.DB_PATH = Path(db_path)
+    phases = {
+        "build_capacity_and_utilization": server.build_capacity_and_utilization,
+        "build_recommendations": server.build_recommendations,
+    }
+    results = {}
+    try:
+        for name, fn in phases.items():
+            samples = []
+            for _ in range(repeat):
+                for year in years:
+                    for scenario in SCENARIOS:
+                        started = time.perf_counter()
+                        fn(year, scenario)
+                        samples.append(time.perf_counter() - started)
+            results[name] = summarize(samples)
+            print(f"  {name:<34}{results[name]['p50_ms']:>10.1f} ms p50{results[name]['p99_ms']:>10.1f} ms p99")
+        # Every year and scenario in one pass, as POST /api/recommendations/run with "all".
+        samples = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            server.build_recommendations()
+            samples.append(time.perf_counter() - started)
+        name = "build_recommendations_all"
+        results[name] = summarize(samples)
+        print(f"  {name:<34}{results[name]['p50_ms']:>10.1f} ms p50{results[name]['p99_ms']:>10.1f} ms p99")
+    finally:
+        # The server subprocess needs the file next.
+        if server._db is not None:
+            server._db.close()
+            server._db = None
+    return results
+
+
+def run_concurrent(jobs, concurrency):
+    """Run (key, callable) jobs on `concurrency` client threads; returns per-key samples and wall time."""
+    samples = {}
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for key, elapsed in pool.map(lambda job: (job[0], job[1]()), jobs):
+            samples.setdefault(key, []).append(elapsed)
+    return samples, time.perf_counter() - started
+
+
+def bench_api(base_url, requests_per_endpoint, concurrency):
+    jobs = [(ep, lambda ep=ep: timed_request(base_url + ep)) for ep in ENDPOINTS] * requests_per_endpoint
+    random.Random(0).shuffle(jobs)
+    samples, wall = run_concurrent(jobs, concurrency)
+    results = {ep: summarize(samples[ep]) for ep in ENDPOINTS}
+    for ep in ENDPOINTS:
+        print(f"  {ep:<68}{results[ep]['p50_ms']:>8.2f} ms p50{results[ep]['p99_ms']:>8.2f} ms p99")
+    return {"concurrency": concurrency, "throughput_rps": len(jobs) / wall, "endpoints": results}
+
+
+def bench_pmtiles(base_url, file_size, reads, concurrency, chunk=16384):
+    rng = random.Random(0)
+    jobs = []
+    for _ in range(reads):
+        start = rng.randrange(0, max(1, file_size - chunk))
+        header = {"Range": f"bytes={start}-{start + chunk - 1}"}
+        jobs.append(("range", lambda header=header: timed_request(base_url + "/tiles/goteborg.pmtiles", headers=header)))
+    samples, wall = run_concurrent(jobs, concurrency)
+    result = summarize(samples["range"])
+    result.update({"chunk_bytes": chunk, "throughput_mb_s": reads * chunk / wall / 1e6})
+    print(f"  range reads ({chunk} B){'':<50}{result['p50_ms']:>8.2f} ms p50{result['p99_ms']:>8.2f} ms p99")
+    return result
+
+
+def bench_exports(base_url, years, repeat):
+    results = {}
+    for dataset in EXPORT_DATASETS:
+        samples = []
+        for _ in range(repeat):
+            for year in years:
+                samples.append(timed_request(f"{base_url}/api/export?dataset={dataset}&year={year}&scenario_id=base"))
+        results[dataset] = summarize(samples)
+        print(f"  {dataset:<68}{results[dataset]['p50_ms']:>8.2f} ms p50{results[dataset]['p99_ms']:>8.2f} ms p99")
+    return results
+
+
+def flatten(results, prefix=""):
+    for key, value in results.items():
+        path = f"{prefix}/{key}" if prefix else key
+        if isinstance(value, dict):
+            yield from flatten(value, path)
+        elif key == "p50_ms":
+            yield path, value
+
+
+def compare(before_path, after_path, threshold):
+    before = dict(flatten(json.loads(Path(before_path).read_text(encoding="utf-8"))["results"]))
+    after = dict(flatten(json.loads(Path(after_path).read_text(encoding="utf-8"))["results"]))
+    regressions = 0
+    print(f"{'metric (p50)':<90}{'before':>10}{'after':>10}{'change':>9}")
+    for key in before:
+        if key not in after:
+            continue
+        b, a = before[key], after[key]
+        change = (a - b) / b if b else 0.0
+        flag = " <-- regression" if change > threshold else ""
+        regressions += bool(flag)
+        print(f"{key:<90}{b:>8.2f}ms{a:>8.2f}ms{change:>+8.0%}{flag}")
+    return 1 if regressions else 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark recompute, API, PMTiles and exports on synthetic data.")
+    parser.add_argument("--preset", choices=sorted(PRESETS), default="10x")
+    parser.add_argument("--scale", type=float, help="Multiplier on the 1x unit instead of --preset")
+    parser.add_argument("--db", help="Benchmark a copy of this database instead of generating one")
+    parser.add_argument("--pmtiles", help="PMTiles file to serve (default: a random file of --pmtiles-mb)")
+    parser.add_argument("--pmtiles-mb", type=int, default=64)
+    parser.add_argument("--years", type=int, nargs="+", default=[2026, 2030], help="Years to recompute and export")
+    parser.add_argument("--repeat", type=int, default=3, help="Repeats for recompute and export timings")
+    parser.add_argument("--requests", type=int, default=50, help="Requests per API endpoint")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--out", help="Write results as JSON (default: bench-<commit>.json)")
+    parser.add_argument("--compare", nargs=2, metavar=("BEFORE", "AFTER"), help="Compare two result files and exit")
+    parser.add_argument("--threshold", type=float, default=0.10, help="Relative p50 slowdown reported as regression")
+    args = parser.parse_args()
+
+    if args.compare:
+        return compare(*args.compare, args.threshold)
+
+    workdir = Path(tempfile.mkdtemp(prefix="planning-bench-"))
+    commit = git_commit()
+    try:
+        db_path = workdir / "bench.db"
+        if args.db:
+            shutil.copyfile(args.db, db_path)
+            sizes = None
+        else:
+            sizes = sizes_for(None if args.scale else args.preset, args.scale)
+            print(f"Generating {sizes}")
+            generate(str(workdir / "source"), sizes)
+            build_database(str(workdir / "source"), str(db_path))
+
+        pmtiles_path = Path(args.pmtiles) if args.pmtiles else workdir / "bench.pmtiles"
+        if not args.pmtiles:
+            with open(pmtiles_path, "wb") as f:
+                f.write(random.Random(0).randbytes(args.pmtiles_mb * 1024 * 1024))
+
+        results = {}
+        print("Recompute")
+        results["recompute"] = bench_recompute(db_path, args.years, args.repeat)
+
+        proc, base_url = start_local_server(db_path, pmtiles_path)
+        try:
+            print(f"API ({args.concurrency} concurrent clients)")
+            results["api"] = bench_api(base_url, args.requests, args.concurrency)
+            print("PMTiles")
+            results["pmtiles"] = bench_pmtiles(
+                base_url, pmtiles_path.stat().st_size, args.requests * 4, args.concurrency
+            )
+            print("Exports")
+            results["exports"] = bench_exports(base_url, args.years, args.repeat)
+        finally:
+            proc.terminate()
+            proc.wait()
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    payload = {
+        "meta": {
+            "commit": commit,
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "python": platform.python_version(),
+            "duckdb": duckdb.__version__,
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "sizes": sizes,
+            "db": args.db,
+            "args": {k: v for k, v in vars(args).items() if k not in ("compare", "out")},
+        },
+        "results": results,
+    }
+    out = args.out or f"bench-{(commit or 'local')[:10]}.json"
+    Path(out).write_text(json.dumps(payload, indent=2), encoding="utf-8")
+    print(f"Wrote {out}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
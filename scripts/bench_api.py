@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+import argparse
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+import urllib.request
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+# Every read endpoint the web app calls, with the parameters it sends.
+ENDPOINTS = [
+    "/api/health",
+    "/api/districts",
+    "/api/map/district-balance?year=2026&scenario_id=base",
+    "/api/schools?year=2026",
+    "/api/forecast?scenario_id=base",
+    "/api/kpis?year=2026&scenario_id=base",
+    "/api/district-capacity?year=2026&scenario_id=base",
+    "/api/school-utilization?year=2026&scenario_id=base",
+    "/api/recommendations?year=2026&scenario_id=base",
+    "/api/constraints",
+    "/api/recommendation-rules?constraint_id=default",
+    "/api/metrics",
+    "/api/export?dataset=recommendations&year=2026&scenario_id=base",
+    "/api/export?dataset=district_capacity&year=2026&scenario_id=base",
+    "/api/export?dataset=school_utilization&year=2026&scenario_id=base",
+]
+
+
+def start_local_server(db_path, pmtiles_path=None):
+    """Run app/server.py in its own process so client threads don't share its GIL."""
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    env = dict(os.environ, HOST="127.0.0.1", PORT=str(port), DB_PATH=str(Path(db_path).resolve()))
+    if pmtiles_path:
+        env["PMTILES_PATH"] = str(Path(pmtiles_path).resolve())
+    proc = subprocess.Popen(
+        [sys.executable, str(ROOT / "app" / "server.py")],
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    base_url = f"http://127.0.0.1:{port}"
+    deadline = time.monotonic() + 15
+    while True:
+        try:
+            timed_request(base_url + "/api/health")
+            return proc, base_url
+        except OSError:
+            if proc.poll() is not None or time.monotonic() > deadline:
+                proc.kill()
+                raise SystemExit(f"Server did not start on {base_url}")
+            time.sleep(0.1)
+
+
+def timed_request(url, method="GET", body=None, headers=None):
+    data = json.dumps(body).encode("utf-8") if body is not None else None
+    req = urllib.request.Request(
+        url, data=data, method=method, headers={"Content-Type": "application/json", **(headers or {})}
+    )
+    started = time.perf_counter()
+    with urllib.request.urlopen(req) as resp:
+        resp.read()
+    return time.perf_counter() - started
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, int(round(pct / 100 * (len(ordered) - 1)))))
+    return ordered[index]
+
+
+def summarize(samples):
+    return {
+        "n": len(samples),
+        "p50_ms": percentile(samples, 50) * 1000,
+        "p90_ms": percentile(samples, 90) * 1000,
+        "p95_ms": percentile(samples, 95) * 1000,
+        "p99_ms": percentile(samples, 99) * 1000,
+        "mean_ms": statistics.fmean(samples) * 1000,
+    }
+
+
+def run(base_url, repeat, warmup):
+    # Make sure derived tables exist for the year/scenario the reads use.
+    timed_request(base_url + "/api/recommendations/run", "POST", {"year": 2026, "scenario_id": "base"})
+    results = {}
+    for endpoint in ENDPOINTS:
+        for _ in range(warmup):
+            timed_request(base_url + endpoint)
+        samples = [timed_request(base_url + endpoint) for _ in range(repeat)]
+        results[endpoint] = summarize(samples)
+        print(f"{endpoint:<70}{results[endpoint]['p50_ms']:>9.2f} ms p50{results[endpoint]['p95_ms']:>9.2f} ms p95")
+    return results
+
+
+def compare(before_path, after_path):
+    before = json.loads(Path(before_path).read_text(encoding="utf-8"))["endpoints"]
+    after = json.loads(Path(after_path).read_text(encoding="utf-8"))["endpoints"]
+    print(f"{'endpoint':<70}{'before p50':>12}{'after p50':>12}{'speedup':>9}")
+    for endpoint in ENDPOINTS:
+        if endpoint not in before or endpoint not in after:
+            continue
+        b = before[endpoint]["p50_ms"]
+        a = after[endpoint]["p50_ms"]
+        print(f"{endpoint:<70}{b:>10.2f}ms{a:>10.2f}ms{(b / a if a else 0):>8.2f}x")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure latency of every /api/* read endpoint.")
+    parser.add_argument("--db", default=str(ROOT / "data" / "data.db"), help="Database for a locally started server")
+    parser.add_argument("--url", help="Benchmark an already running server instead (e.g. an older checkout)")
+    parser.add_argument("--repeat", type=int, default=50)
+    parser.add_argument("--warmup", type=int, default=5)
+    parser.add_argument("--out", help="Write results as JSON")
+    parser.add_argument("--compare", nargs=2, metavar=("BEFORE", "AFTER"), help="Compare two --out files and exit")
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(*args.compare)
+        return 0
+
+    proc = None
+    base_url = args.url
+    if not base_url:
+        if not os.path.exists(args.db):
+            raise SystemExit(f"Database not found at {args.db}")
+        proc, base_url = start_local_server(args.db)
+    try:
+        results = run(base_url.rstrip("/"), args.repeat, args.warmup)
+    finally:
+        if proc:
+            proc.terminate()
+            proc.wait()
+
+    if args.out:
+        payload = {"url": base_url if args.url else None, "db": None if args.url else args.db, "endpoints": results}
+        Path(args.out).write_text(json.dumps(payload, indent=2), encoding="utf-8")
+        print(f"Wrote {args.out}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -8,6 +8,8 @@ except Exception as e:
     print("Activate a venv and run: pip install duckdb")
     raise
 
+from ingest import ingest_directory
+
 ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 DATA_DIR = os.path.join(ROOT, "data")
 DUMMY_DIR = os.path.join(DATA_DIR, "dummy")
@@ -22,12 +24,7 @@ con = duckdb.connect(DB_PATH)
 with open(SCHEMA_PATH, "r", encoding="utf-8") as f:
     con.execute(f.read())
 
-con.execute("COPY districts FROM ? (HEADER, DELIMITER ',')", [os.path.join(DUMMY_DIR, "districts.csv")])
-con.execute("COPY schools FROM ? (HEADER, DELIMITER ',')", [os.path.join(DUMMY_DIR, "schools.csv")])
-con.execute("COPY students FROM ? (HEADER, DELIMITER ',')", [os.path.join(DUMMY_DIR, "students.csv")])
-con.execute("COPY scenarios FROM ? (HEADER, DELIMITER ',')", [os.path.join(DUMMY_DIR, "scenarios.csv")])
-con.execute("COPY forecast FROM ? (HEADER, DELIMITER ',')", [os.path.join(DUMMY_DIR, "forecast.csv")])
-con.execute("COPY constraints FROM ? (HEADER, DELIMITER ',')", [os.path.join(DUMMY_DIR, "constraints.csv")])
+ingest_directory(con, DUMMY_DIR, verbose=False)
 
 # Expand forecast to 2026-2036 from the 2026 baseline if years are missing.
 for scenario_id, yearly_change in [("base", -0.015), ("low", -0.022), ("high", -0.008)]:
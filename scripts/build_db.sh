@@ -20,6 +20,7 @@ COPY students FROM '$DUMMY_DIR/students.csv' (HEADER, DELIMITER ',');
 COPY scenarios FROM '$DUMMY_DIR/scenarios.csv' (HEADER, DELIMITER ',');
 COPY forecast FROM '$DUMMY_DIR/forecast.csv' (HEADER, DELIMITER ',');
 COPY constraints FROM '$DUMMY_DIR/constraints.csv' (HEADER, DELIMITER ',');
+COPY recommendation_rules FROM '$DUMMY_DIR/recommendation_rules.csv' (HEADER, DELIMITER ',');
 
 INSERT INTO forecast (district_id, year, scenario_id, expected_students)
 SELECT f.district_id, y.year, 'base', CAST(ROUND(f.expected_students * POW(1 - 0.015, (y.year - 2026))) AS INTEGER)
@@ -4,29 +4,194 @@ set -euo pipefail
 ROOT="$(cd "$(dirname "${BASH_SOURCE[0]}")/.." && pwd)"
 RAW_DIR="$ROOT/map-data/raw"
 TILES_DIR="$ROOT/map-data/tiles"
+LAYER_DIR="$TILES_DIR/layers"
 WEB_TILES_DIR="$ROOT/web/tiles"
+PYTHON_BIN="$ROOT/.venv/bin/python"
 
-mkdir -p "$RAW_DIR" "$TILES_DIR" "$WEB_TILES_DIR"
+if [ ! -x "$PYTHON_BIN" ]; then
+  PYTHON_BIN="python3"
+fi
 
-echo "[1/3] Fetching OSM data for Gothenburg from Overpass..."
-python3 "$ROOT/scripts/fetch_goteborg_osm.py"
+LAYERS=(roads water_lines water_polygons green_areas buildings)
 
-echo "[2/3] Building MBTiles with tippecanoe..."
-rm -f "$TILES_DIR/goteborg.mbtiles"
+# Everything that affects tile contents. It is part of each layer's hash, so
+# changing an option rebuilds the layers instead of reusing stale tiles.
+# Layers are built one by one, so the zoom range is pinned: with -zg or
+# --extend-zooms-if-still-dropping each layer would pick its own maxzoom, and
+# tile-join does not overzoom, so sparse layers would vanish past theirs.
+MAXZOOM=14
+ZOOM_OPTS=(-Z0 "-z$MAXZOOM")
+TIPPECANOE_OPTS=(--drop-densest-as-needed --simplification=2)
 
-tippecanoe -zg --force \
-  --drop-densest-as-needed \
-  --extend-zooms-if-still-dropping \
-  --simplification=2 \
-  -o "$TILES_DIR/goteborg.mbtiles" \
-  -L roads:"$RAW_DIR/roads.geojson" \
-  -L water_lines:"$RAW_DIR/water_lines.geojson" \
-  -L water_polygons:"$RAW_DIR/water_polygons.geojson" \
-  -L green_areas:"$RAW_DIR/green_areas.geojson" \
-  -L buildings:"$RAW_DIR/buildings.geojson"
+# The merged tile keeps tippecanoe's 500 KB budget by splitting it between the
+# layers (tile-join runs with --no-tile-size-limit and never drops anything).
+layer_tile_bytes() {
+  case "$1" in
+    buildings) echo 200000 ;;
+    roads) echo 150000 ;;
+    *) echo 50000 ;;
+  esac
+}
 
-echo "[3/3] Converting MBTiles -> PMTiles..."
-pmtiles convert "$TILES_DIR/goteborg.mbtiles" "$WEB_TILES_DIR/goteborg.pmtiles"
+usage() {
+  cat <<EOF
+Usage: $(basename "$0") [options]
+
+Rebuilds only the layers whose raw GeoJSON (or tippecanoe options) changed
+since the last run, then merges and converts to PMTiles if anything did.
+
+  --no-fetch        Use map-data/raw as is instead of running fetch_goteborg_osm.py
+  --refresh         Refetch every Overpass tile instead of using the cache
+  --force           Rebuild every layer even if its hash is unchanged
+  --bbox S,W,N,E    Only regenerate tiles intersecting this box in changed layers
+  --zoom MIN-MAX    Only regenerate these zoom levels in changed layers
+  --jobs N          Layers built in parallel (default: ${#LAYERS[@]})
+EOF
+}
+
+FETCH=1
+REFRESH=()
+FORCE=0
+BBOX=""
+ZOOM=""
+JOBS=${#LAYERS[@]}
+
+while [ $# -gt 0 ]; do
+  case "$1" in
+    --no-fetch) FETCH=0 ;;
+    --refresh) REFRESH=(--refresh) ;;
+    --force) FORCE=1 ;;
+    --bbox) BBOX="$2"; shift ;;
+    --zoom) ZOOM="$2"; shift ;;
+    --jobs) JOBS="$2"; shift ;;
+    -h|--help) usage; exit 0 ;;
+    *) echo "Unknown option: $1"; usage; exit 1 ;;
+  esac
+  shift
+done
+
+if [ -n "$ZOOM" ] && [ "${ZOOM#*-}" -gt "$MAXZOOM" ]; then
+  echo "--zoom must stay within 0-$MAXZOOM, the zoom range of every layer"
+  exit 1
+fi
+
+mkdir -p "$RAW_DIR" "$LAYER_DIR" "$WEB_TILES_DIR"
+
+hash_stdin() {
+  if command -v sha256sum >/dev/null 2>&1; then
+    sha256sum | cut -d' ' -f1
+  else
+    shasum -a 256 | cut -d' ' -f1
+  fi
+}
+
+layer_opts() {
+  echo "${TIPPECANOE_OPTS[*]} --maximum-tile-bytes=$(layer_tile_bytes "$1")"
+}
+
+layer_hash() {
+  { hash_stdin < "$RAW_DIR/$1.geojson"; echo "${ZOOM_OPTS[*]} $(layer_opts "$1")"; } | hash_stdin
+}
+
+build_layer() {
+  local layer="$1" hash="$2" started=$SECONDS
+  local target="$LAYER_DIR/$layer.mbtiles"
+  local part="$LAYER_DIR/$layer.part.mbtiles"
+
+  if [ -n "$BBOX$ZOOM" ] && [ -f "$target" ]; then
+    local window=()
+    [ -n "$BBOX" ] && window+=(--bbox "$BBOX")
+    [ -n "$ZOOM" ] && window+=(--zoom "$ZOOM")
+    # Zoom and clip arguments for the window, e.g. "-Z10 -z14 --clip-bounding-box=...".
+    local plan
+    plan=$("$PYTHON_BIN" "$ROOT/scripts/mbtiles_patch.py" plan "$target" "${window[@]}")
+    # shellcheck disable=SC2086,SC2046
+    tippecanoe --force -P $plan $(layer_opts "$layer") -l "$layer" -o "$part" "$RAW_DIR/$layer.geojson"
+    "$PYTHON_BIN" "$ROOT/scripts/mbtiles_patch.py" patch "$target" "$part" "${window[@]}"
+    rm -f "$part"
+    # Tiles outside the window are still stale: record the hash as partial, so the
+    # merge below still sees a change but the next plain build rebuilds the layer.
+    echo "partial:$hash" > "$LAYER_DIR/$layer.sha256"
+  else
+    # shellcheck disable=SC2046
+    tippecanoe --force -P "${ZOOM_OPTS[@]}" $(layer_opts "$layer") -l "$layer" -o "$part" "$RAW_DIR/$layer.geojson"
+    mv "$part" "$target"
+    echo "$hash" > "$LAYER_DIR/$layer.sha256"
+  fi
+  echo "  $layer built in $((SECONDS - started))s"
+}
+
+finish_layer() {
+  if wait "$2"; then
+    tail -n 1 "$LAYER_DIR/$1.log"
+  else
+    echo "  $1 failed, see $LAYER_DIR/$1.log"
+    failed=1
+  fi
+}
+
+if [ "$FETCH" -eq 1 ]; then
+  echo "[1/4] Fetching OSM data for Gothenburg from Overpass..."
+  "$PYTHON_BIN" "$ROOT/scripts/fetch_goteborg_osm.py" ${REFRESH[@]+"${REFRESH[@]}"}
+else
+  echo "[1/4] Skipping fetch (--no-fetch)"
+fi
+
+echo "[2/4] Building changed layers with tippecanoe..."
+pids=()
+names=()
+failed=0
+for layer in "${LAYERS[@]}"; do
+  if [ ! -f "$RAW_DIR/$layer.geojson" ]; then
+    echo "Missing $RAW_DIR/$layer.geojson. Run without --no-fetch."
+    exit 1
+  fi
+  hash=$(layer_hash "$layer")
+  if [ "$FORCE" -eq 0 ] && [ -f "$LAYER_DIR/$layer.mbtiles" ] \
+    && [ "$(cat "$LAYER_DIR/$layer.sha256" 2>/dev/null)" = "$hash" ]; then
+    echo "  $layer unchanged"
+    continue
+  fi
+  # Hold the pool at --jobs: wait for the oldest build before starting another.
+  if [ ${#pids[@]} -ge "$JOBS" ]; then
+    finish_layer "${names[0]}" "${pids[0]}"
+    pids=(${pids[@]+"${pids[@]:1}"})
+    names=(${names[@]+"${names[@]:1}"})
+  fi
+  build_layer "$layer" "$hash" > "$LAYER_DIR/$layer.log" 2>&1 &
+  pids+=($!)
+  names+=("$layer")
+  echo "  $layer changed, building (log: $LAYER_DIR/$layer.log)"
+done
+for i in ${pids[@]+"${!pids[@]}"}; do
+  finish_layer "${names[$i]}" "${pids[$i]}"
+done
+[ "$failed" -eq 0 ] || exit 1
+
+merged_hash=$(for layer in "${LAYERS[@]}"; do cat "$LAYER_DIR/$layer.sha256"; done | hash_stdin)
+
+echo "[3/4] Merging layers with tile-join..."
+if [ -f "$TILES_DIR/goteborg.mbtiles" ] && [ "$(cat "$TILES_DIR/goteborg.sha256" 2>/dev/null)" = "$merged_hash" ]; then
+  echo "  no layer changed"
+else
+  layer_files=()
+  for layer in "${LAYERS[@]}"; do
+    layer_files+=("$LAYER_DIR/$layer.mbtiles")
+  done
+  # Each layer already fits its share of the tile budget; don't let tile-join drop tiles again.
+  tile-join --force --no-tile-size-limit -o "$TILES_DIR/goteborg.mbtiles" "${layer_files[@]}"
+  rm -f "$TILES_DIR/goteborg.sha256"
+fi
+
+echo "[4/4] Converting MBTiles -> PMTiles..."
+if [ -f "$WEB_TILES_DIR/goteborg.pmtiles" ] && [ "$(cat "$TILES_DIR/goteborg.sha256" 2>/dev/null)" = "$merged_hash" ]; then
+  echo "  up to date"
+else
+  # Convert next to the MBTiles and move into place, so the server never serves a half-written file.
+  pmtiles convert "$TILES_DIR/goteborg.mbtiles" "$TILES_DIR/goteborg.pmtiles"
+  mv "$TILES_DIR/goteborg.pmtiles" "$WEB_TILES_DIR/goteborg.pmtiles"
+  echo "$merged_hash" > "$TILES_DIR/goteborg.sha256"
+fi
 
 ls -lh "$WEB_TILES_DIR/goteborg.pmtiles"
 echo "PMTiles ready: $WEB_TILES_DIR/goteborg.pmtiles"
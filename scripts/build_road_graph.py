@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+import argparse
+import csv
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+try:
+    import duckdb
+except Exception as e:
+    print("DuckDB Python package not installed.")
+    print("Activate a venv and run: pip install duckdb")
+    raise
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT / "app"))
+
+from routing import GRAPH_DIR, MODES, ROADS_PATH, load_or_build  # noqa: E402
+
+DB_PATH = ROOT / "data" / "data.db"
+
+
+def bulk_insert(con, table, columns, rows):
+    """Insert rows through a temporary CSV; far faster than executemany on DuckDB."""
+    if not rows:
+        return
+    with tempfile.NamedTemporaryFile("w", suffix=".csv", newline="", delete=False) as f:
+        csv.writer(f).writerows(rows)
+        path = f.name
+    spec = ", ".join(f"'{name}': '{dtype}'" for name, dtype in columns.items())
+    try:
+        con.execute(
+            f"INSERT INTO {table} ({', '.join(columns)}) "
+            f"SELECT * FROM read_csv(?, header = false, columns = {{{spec}}})",
+            [path],
+        )
+    finally:
+        os.remove(path)
+
+
+def school_pairs(graph, snapped, max_km):
+    """Network distance for every school pair closer than max_km."""
+    rows = []
+    by_node = {}
+    for school_id, (node, offset) in snapped.items():
+        by_node.setdefault(node, []).append((school_id, offset))
+    for school_id, (node, offset) in snapped.items():
+        reached = graph.from_node(node, max_km)
+        for other_node, km in reached.items():
+            for other_id, other_offset in by_node.get(other_node, ()):
+                total = offset + km + other_offset
+                if other_id != school_id and total <= max_km:
+                    rows.append((school_id, other_id, round(total, 4)))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the road graph and cache network distances in DuckDB.")
+    parser.add_argument("--mode", choices=MODES, default="walk")
+    parser.add_argument("--roads", type=Path, default=ROADS_PATH)
+    parser.add_argument("--graph-dir", type=Path, default=GRAPH_DIR)
+    parser.add_argument("--db", default=str(DB_PATH))
+    parser.add_argument("--year", type=int, nargs="+", help="Student years to route (default: all)")
+    parser.add_argument("--pair-km", type=float, help="Max school-school distance to store (default: max_distance_km)")
+    args = parser.parse_args()
+
+    if not args.roads.exists():
+        raise SystemExit(f"{args.roads} not found. Run scripts/fetch_goteborg_osm.py first.")
+
+    started = time.perf_counter()
+    graph, built = load_or_build(args.mode, args.roads, args.graph_dir)
+    print(
+        f"{'Built' if built else 'Loaded'} {args.mode} graph: {graph.node_count} nodes, {graph.edge_count} edges "
+        f"({time.perf_counter() - started:.2f}s)"
+    )
+
+    con = duckdb.connect(args.db)
+    try:
+        schools = con.execute("SELECT school_id, y_lat, x_lon FROM schools WHERE status = 'active'").fetchall()
+        max_distance = con.execute("SELECT MAX(max_distance_km) FROM constraints").fetchone()[0] or 3.0
+        pair_km = args.pair_km or max_distance
+        if pair_km < max_distance:
+            print(f"  --pair-km {pair_km:.1f} is below max_distance_km {max_distance:.1f}; farther pairs never merge")
+
+        started = time.perf_counter()
+        snapped = {}
+        for school_id, lat, lon in schools:
+            node, offset = graph.snap(lat, lon)
+            if node is None:
+                print(f"  school {school_id} is more than 1 km from the {args.mode} network, skipped")
+                continue
+            snapped[school_id] = (node, offset)
+
+        pairs = school_pairs(graph, snapped, pair_km)
+        print(f"School pairs within {pair_km:.1f} km: {len(pairs)} ({time.perf_counter() - started:.2f}s)")
+
+        started = time.perf_counter()
+        dist, label = graph.multi_source((node, offset, school_id) for school_id, (node, offset) in snapped.items())
+        print(f"Multi-source Dijkstra from {len(snapped)} schools ({time.perf_counter() - started:.2f}s)")
+
+        started = time.perf_counter()
+        where = ""
+        params = []
+        if args.year:
+            where = f"WHERE year IN ({', '.join('?' for _ in args.year)})"
+            params = args.year
+        students = con.execute(f"SELECT year, student_id, y_lat, x_lon FROM students {where}", params).fetchall()
+        student_rows = []
+        for year, student_id, lat, lon in students:
+            node, offset = graph.snap(lat, lon)
+            if node is None or label[node] is None:
+                continue
+            student_rows.append((args.mode, year, student_id, label[node], round(offset + dist[node], 4)))
+        print(f"Routed {len(student_rows)}/{len(students)} students ({time.perf_counter() - started:.2f}s)")
+
+        con.execute("BEGIN TRANSACTION")
+        con.execute("DELETE FROM school_network_distance WHERE mode = ?", [args.mode])
+        con.execute("DELETE FROM school_network_snap WHERE mode = ?", [args.mode])
+        bulk_insert(
+            con,
+            "school_network_snap",
+            {"mode": "VARCHAR", "school_id": "VARCHAR", "snap_km": "DOUBLE", "pair_km": "DOUBLE"},
+            [(args.mode, school_id, round(offset, 4), pair_km) for school_id, (_, offset) in snapped.items()],
+        )
+        bulk_insert(
+            con,
+            "school_network_distance",
+            {"mode": "VARCHAR", "school_a": "VARCHAR", "school_b": "VARCHAR", "distance_km": "DOUBLE"},
+            [(args.mode, a, b, km) for a, b, km in pairs],
+        )
+        if args.year:
+            con.execute(
+                f"DELETE FROM student_network_distance WHERE mode = ? AND year IN ({', '.join('?' for _ in args.year)})",
+                [args.mode, *args.year],
+            )
+        else:
+            con.execute("DELETE FROM student_network_distance WHERE mode = ?", [args.mode])
+        bulk_insert(
+            con,
+            "student_network_distance",
+            {
+                "mode": "VARCHAR",
+                "year": "INTEGER",
+                "student_id": "VARCHAR",
+                "nearest_school_id": "VARCHAR",
+                "distance_km": "DOUBLE",
+            },
+            student_rows,
+        )
+        con.execute("COMMIT")
+    except duckdb.CatalogException as exc:
+        raise SystemExit(f"{exc}\nRun scripts/migrate_schema.py to add the network distance tables.") from exc
+    finally:
+        con.close()
+    print(f"Updated {args.db}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
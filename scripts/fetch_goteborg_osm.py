@@ -1,14 +1,20 @@
 #!/usr/bin/env python3
+import argparse
+import hashlib
 import json
+import os
+import re
+import shutil
 import time
 import urllib.parse
 import urllib.request
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from pathlib import Path
 from urllib.error import HTTPError, URLError
 
 ROOT = Path(__file__).resolve().parent.parent
 RAW_DIR = ROOT / "map-data" / "raw"
-RAW_DIR.mkdir(parents=True, exist_ok=True)
+CACHE_DIR = ROOT / "map-data" / "cache" / "overpass"
 
 # Gothenburg bounding box: south,west,north,east
 BBOX = "57.60,11.80,57.78,12.08"
@@ -18,15 +24,17 @@ OVERPASS_URLS = [
     "https://overpass.openstreetmap.fr/api/interpreter",
 ]
 
-QUERY = f"""
+LAYERS = ["roads", "water_lines", "water_polygons", "green_areas", "buildings"]
+
+QUERY_TEMPLATE = """
 [out:json][timeout:90];
 (
-  way["highway"]({BBOX});
-  way["waterway"]({BBOX});
-  way["natural"="water"]({BBOX});
-  way["landuse"="forest"]({BBOX});
-  way["leisure"="park"]({BBOX});
-  way["building"]({BBOX});
+  way["highway"]({bbox});
+  way["waterway"]({bbox});
+  way["natural"="water"]({bbox});
+  way["landuse"="forest"]({bbox});
+  way["leisure"="park"]({bbox});
+  way["building"]({bbox});
 );
 out geom;
 """
@@ -73,54 +81,198 @@ def layer_for(tags):
     return None, None
 
 
-def main():
-    payload = None
+def split_bbox(bbox, tile_deg):
+    """Split "south,west,north,east" into a grid of tiles no larger than tile_deg."""
+    south, west, north, east = (float(v) for v in bbox.split(","))
+    rows = max(1, int(-(-(north - south) // tile_deg)))
+    cols = max(1, int(-(-(east - west) // tile_deg)))
+    dlat = (north - south) / rows
+    dlon = (east - west) / cols
+    tiles = []
+    for r in range(rows):
+        for c in range(cols):
+            tiles.append(
+                f"{south + r * dlat:.5f},{west + c * dlon:.5f},{south + (r + 1) * dlat:.5f},{west + (c + 1) * dlon:.5f}"
+            )
+    return tiles
+
+
+def fetch_tile(tile, endpoints, cache_dir, refresh=False):
+    """Download one tile to the on-disk cache and return the cached file path.
+
+    The response is streamed straight to disk, so a tile never has to fit in
+    memory. Overpass reports timeouts inside a 200 response ("remark"), those
+    are treated as failures and never cached.
+    """
+    query = QUERY_TEMPLATE.format(bbox=tile)
+    path = cache_dir / f"{hashlib.sha1(query.encode('utf-8')).hexdigest()}.json"
+    if path.exists() and not refresh:
+        return path, "cache"
+
     last_error = None
-    for url in OVERPASS_URLS:
+    for url in endpoints:
         for attempt in range(1, 4):
             req = urllib.request.Request(
                 url,
-                data=urllib.parse.urlencode({"data": QUERY}).encode("utf-8"),
+                data=urllib.parse.urlencode({"data": query}).encode("utf-8"),
                 method="POST",
                 headers={"User-Agent": "school-planning-poc/1.0"},
             )
+            tmp = path.with_suffix(f".{os.getpid()}.{id(tile)}.part")
             try:
-                with urllib.request.urlopen(req, timeout=120) as resp:
-                    payload = json.loads(resp.read().decode("utf-8"))
-                    print(f"Fetched OSM data from {url} (attempt {attempt})")
-                    break
-            except (HTTPError, URLError, TimeoutError) as exc:
+                with urllib.request.urlopen(req, timeout=120) as resp, tmp.open("wb") as out:
+                    shutil.copyfileobj(resp, out, 1 << 20)
+                remark = overpass_remark(tmp)
+                if remark and "error" in remark.lower():
+                    raise URLError(f"Overpass error: {remark}")
+                tmp.replace(path)
+                return path, url
+            except (HTTPError, URLError, TimeoutError, OSError) as exc:
                 last_error = exc
-                print(f"Fetch failed from {url} (attempt {attempt}): {exc}")
+                tmp.unlink(missing_ok=True)
+                print(f"Fetch failed for tile {tile} from {url} (attempt {attempt}): {exc}")
                 time.sleep(2 * attempt)
-        if payload is not None:
-            break
+    raise SystemExit(f"All Overpass endpoints failed for tile {tile}. Last error: {last_error}")
 
-    if payload is None:
-        raise SystemExit(f"All Overpass endpoints failed. Last error: {last_error}")
 
-    layers = {
-        "roads": [],
-        "water_lines": [],
-        "water_polygons": [],
-        "green_areas": [],
-        "buildings": [],
-    }
+def overpass_remark(path, tail_bytes=4096):
+    with path.open("rb") as f:
+        f.seek(max(0, path.stat().st_size - tail_bytes))
+        tail = f.read().decode("utf-8", errors="replace")
+    match = re.search(r'"remark"\s*:\s*"((?:[^"\\]|\\.)*)"', tail)
+    return match.group(1) if match else None
+
+
+_WS = re.compile(r"[\s,]*")
+
 
-    for element in payload.get("elements", []):
-        tags = element.get("tags", {})
-        layer_name, geom_type = layer_for(tags)
-        if not layer_name:
+def iter_elements(fp, chunk_size=1 << 20):
+    """Yield the objects of the top-level "elements" array without loading the whole document."""
+    decoder = json.JSONDecoder()
+    buf = ""
+    while True:
+        idx = buf.find('"elements"')
+        bracket = buf.find("[", idx) if idx != -1 else -1
+        if bracket != -1:
+            pos = bracket + 1
+            break
+        chunk = fp.read(chunk_size)
+        if not chunk:
+            return
+        buf += chunk
+
+    while True:
+        pos = _WS.match(buf, pos).end()
+        if pos < len(buf) and buf[pos] == "]":
+            return
+        try:
+            element, pos = decoder.raw_decode(buf, pos)
+        except json.JSONDecodeError:
+            chunk = fp.read(chunk_size)
+            if not chunk:
+                raise
+            buf = buf[pos:] + chunk
+            pos = 0
             continue
-        feature = to_feature(element, geom_type, layer_name)
-        if feature:
-            layers[layer_name].append(feature)
-
-    for layer_name, features in layers.items():
-        geojson = {"type": "FeatureCollection", "features": features}
-        path = RAW_DIR / f"{layer_name}.geojson"
-        path.write_text(json.dumps(geojson), encoding="utf-8")
-        print(f"Wrote {path} ({len(features)} features)")
+        yield element
+
+
+class LayerWriter:
+    """Newline-delimited GeoJSON features per layer, written to .part files and renamed on close."""
+
+    def __init__(self, out_dir):
+        self.paths = {layer: out_dir / f"{layer}.geojson" for layer in LAYERS}
+        self.files = {
+            layer: path.with_suffix(".geojson.part").open("w", encoding="utf-8") for layer, path in self.paths.items()
+        }
+        self.counts = dict.fromkeys(LAYERS, 0)
+
+    def write(self, layer_name, feature):
+        self.files[layer_name].write(json.dumps(feature, ensure_ascii=False, separators=(",", ":")))
+        self.files[layer_name].write("\n")
+        self.counts[layer_name] += 1
+
+    def close(self, commit=True):
+        for layer, f in self.files.items():
+            f.close()
+            part = self.paths[layer].with_suffix(".geojson.part")
+            if commit:
+                part.replace(self.paths[layer])
+            else:
+                part.unlink(missing_ok=True)
+
+
+def inside(element, tile):
+    """True if the element's geometry lies strictly within tile, so no other tile returns it."""
+    south, west, north, east = tile
+    bounds = element.get("bounds")
+    if bounds:
+        lats = bounds["minlat"], bounds["maxlat"]
+        lons = bounds["minlon"], bounds["maxlon"]
+    else:
+        points = element.get("geometry") or ()
+        lats = [pt["lat"] for pt in points]
+        lons = [pt["lon"] for pt in points]
+    return bool(lats) and south < min(lats) and max(lats) < north and west < min(lons) and max(lons) < east
+
+
+def convert(path, writer, seen, tile):
+    tile = tuple(float(v) for v in tile.split(","))
+    with path.open("r", encoding="utf-8") as fp:
+        for element in iter_elements(fp):
+            tags = element.get("tags", {})
+            layer_name, geom_type = layer_for(tags)
+            if not layer_name:
+                continue
+            # Ways crossing a tile edge are returned by every tile they touch; only
+            # those need remembering across tiles.
+            if not inside(element, tile):
+                key = (element.get("type"), element.get("id"))
+                if key in seen:
+                    continue
+                seen.add(key)
+            feature = to_feature(element, geom_type, layer_name)
+            if feature:
+                writer.write(layer_name, feature)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fetch OSM basemap layers from Overpass as newline-delimited GeoJSON.")
+    parser.add_argument("--bbox", default=BBOX, help=f"south,west,north,east (default: {BBOX})")
+    parser.add_argument("--tile-deg", type=float, default=0.05, help="Tile edge length in degrees")
+    parser.add_argument("--workers", type=int, default=3, help="Concurrent Overpass requests")
+    parser.add_argument(
+        "--endpoint",
+        action="append",
+        help="Overpass interpreter URL, repeatable (default: $OVERPASS_URL or the public mirrors)",
+    )
+    parser.add_argument("--cache-dir", type=Path, default=CACHE_DIR)
+    parser.add_argument("--out-dir", type=Path, default=RAW_DIR)
+    parser.add_argument("--refresh", action="store_true", help="Ignore cached tiles")
+    args = parser.parse_args()
+
+    endpoints = args.endpoint or ([os.environ["OVERPASS_URL"]] if os.environ.get("OVERPASS_URL") else OVERPASS_URLS)
+    args.cache_dir.mkdir(parents=True, exist_ok=True)
+    args.out_dir.mkdir(parents=True, exist_ok=True)
+
+    tiles = split_bbox(args.bbox, args.tile_deg)
+    print(f"Fetching {len(tiles)} tiles with {args.workers} workers")
+    writer = LayerWriter(args.out_dir)
+    seen = set()
+    ok = False
+    try:
+        with ThreadPoolExecutor(max_workers=args.workers) as pool:
+            futures = {pool.submit(fetch_tile, tile, endpoints, args.cache_dir, args.refresh): tile for tile in tiles}
+            for done, future in enumerate(as_completed(futures), start=1):
+                path, source = future.result()
+                convert(path, writer, seen, futures[future])
+                print(f"[{done}/{len(tiles)}] tile {futures[future]} ({source})")
+        ok = True
+    finally:
+        writer.close(commit=ok)
+
+    for layer_name in LAYERS:
+        print(f"Wrote {writer.paths[layer_name]} ({writer.counts[layer_name]} features)")
 
 
 if __name__ == "__main__":
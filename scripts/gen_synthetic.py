@@ -0,0 +1,201 @@
+#!/usr/bin/env python3
+import argparse
+import math
+import os
+import shutil
+import sys
+
+try:
+    import duckdb
+except Exception as e:
+    print("DuckDB Python package not installed.")
+    print("Activate a venv and run: pip install duckdb")
+    raise
+
+from ingest import DATA_DIR, SCHEMA_PATH, ingest_directory
+
+# 1x is a small municipality; "region" is roughly all of Västra Götaland.
+PRESETS = {
+    "1x": {"districts": 10, "schools": 40, "students": 5000},
+    "10x": {"districts": 100, "schools": 400, "students": 50000},
+    "100x": {"districts": 1000, "schools": 4000, "students": 500000},
+    "region": {"districts": 250, "schools": 750, "students": 190000},
+}
+UNIT = PRESETS["1x"]
+
+# Same yearly change per scenario as scripts/build_db.py.
+SCENARIOS = [("base", "Bas", -0.015), ("low", "Laag", -0.022), ("high", "Hoeg", -0.008)]
+
+# Gothenburg bbox (west, south, east, north), same area as the basemap.
+BBOX = (11.80, 57.60, 12.08, 57.78)
+
+
+def sizes_for(preset=None, scale=None, districts=None, schools=None, students=None):
+    if preset:
+        sizes = dict(PRESETS[preset])
+    else:
+        factor = scale or 1.0
+        sizes = {k: max(1, int(round(v * factor))) for k, v in UNIT.items()}
+    for key, value in (("districts", districts), ("schools", schools), ("students", students)):
+        if value:
+            sizes[key] = value
+    return sizes
+
+
+def generate(out_dir, sizes, base_year=2026, history_years=1, horizon=2036, seed=42):
+    """Write a deterministic source directory that scripts/ingest.py can load."""
+    if os.path.exists(out_dir):
+        shutil.rmtree(out_dir)
+    os.makedirs(os.path.join(out_dir, "students"))
+
+    n_districts = sizes["districts"]
+    cols = math.ceil(math.sqrt(n_districts))
+    rows = math.ceil(n_districts / cols)
+    west, south, east, north = BBOX
+    cell_w = (east - west) / cols
+    cell_h = (north - south) / rows
+
+    con = duckdb.connect()
+    # u(i, salt) is a deterministic uniform value in [0, 1) so reruns with the
+    # same seed produce identical files.
+    con.execute(f"CREATE MACRO u(i, salt) AS (hash(i, salt, {int(seed)}) % 1000003) / 1000003.0")
+    con.execute(
+        f"""
+        CREATE TABLE districts AS
+        SELECT
+          'D' || (i + 1) AS district_id,
+          'Distrikt ' || (i + 1) AS name,
+          {west} + (i % {cols}) * {cell_w} AS x0,
+          {south} + (i // {cols}) * {cell_h} AS y0,
+          {cell_w} AS w,
+          {cell_h} AS h
+        FROM range({n_districts}) t(i)
+        """
+    )
+    con.execute(
+        f"""
+        COPY (
+          SELECT
+            district_id,
+            name,
+            printf('POLYGON((%.5f %.5f,%.5f %.5f,%.5f %.5f,%.5f %.5f,%.5f %.5f))',
+                   x0, y0, x0 + w, y0, x0 + w, y0 + h, x0, y0 + h, x0, y0) AS geom_wkt,
+            ROUND(w * 60.0 * h * 111.0, 2) AS area_km2
+          FROM districts ORDER BY district_id
+        ) TO '{out_dir}/districts.csv' (HEADER)
+        """
+    )
+
+    # Students cluster unevenly over districts so some run a deficit.
+    con.execute(
+        f"""
+        CREATE TABLE students AS
+        SELECT
+          'E' || (i + 1) AS student_id,
+          6 + CAST(floor(u(i, 'age') * 10) AS INTEGER) AS age,
+          'D' || (1 + CAST(floor({n_districts} * pow(u(i, 'district'), 1.3)) AS INTEGER)) AS district_id,
+          i
+        FROM range({sizes['students']}) t(i)
+        """
+    )
+    for year in range(base_year - history_years + 1, base_year + 1):
+        path = os.path.join(out_dir, "students", f"{year}.parquet")
+        con.execute(
+            f"""
+            COPY (
+              SELECT s.student_id, s.age, {year} AS year, s.district_id,
+                     d.x0 + u(s.i, 'x' || {year}) * d.w AS x_lon,
+                     d.y0 + u(s.i, 'y' || {year}) * d.h AS y_lat
+              FROM students s JOIN districts d USING (district_id)
+              ORDER BY s.district_id
+            ) TO '{path}' (FORMAT PARQUET)
+            """
+        )
+
+    # Capacity is sized to the average demand per school with +/-40% noise.
+    per_school = sizes["students"] / max(1, sizes["schools"])
+    con.execute(
+        f"""
+        COPY (
+          SELECT
+            'S' || (i + 1) AS school_id,
+            'Skola ' || (i + 1) AS name,
+            d.district_id,
+            d.x0 + u(i, 'sx') * d.w AS x_lon,
+            d.y0 + u(i, 'sy') * d.h AS y_lat,
+            CAST(ROUND({per_school} * (0.6 + 0.8 * u(i, 'cap')) / 10) * 10 AS INTEGER) AS capacity_total,
+            1 + CAST(floor(u(i, 'cond') * 5) AS INTEGER) AS condition_score,
+            'active' AS status,
+            1950 + CAST(floor(u(i, 'open') * 70) AS INTEGER) AS opened_year,
+            NULL::INTEGER AS closed_year
+          FROM range({sizes['schools']}) t(i)
+          JOIN districts d ON d.district_id = 'D' || (1 + i % {n_districts})
+          ORDER BY i
+        ) TO '{out_dir}/schools.csv' (HEADER)
+        """
+    )
+
+    scenario_rows = ", ".join(f"('{sid}', '{name}', {change})" for sid, name, change in SCENARIOS)
+    con.execute("CREATE TABLE scenario_change (scenario_id TEXT, name TEXT, yearly_change DOUBLE)")
+    con.execute(f"INSERT INTO scenario_change VALUES {scenario_rows}")
+    con.execute(f"COPY (SELECT scenario_id, name FROM scenario_change) TO '{out_dir}/scenarios.csv' (HEADER)")
+    con.execute(
+        f"""
+        COPY (
+          SELECT d.district_id, y.year, sc.scenario_id,
+                 CAST(ROUND(COALESCE(n.students, 0) * POW(1 + sc.yearly_change, y.year - {base_year})) AS INTEGER)
+                   AS expected_students
+          FROM districts d
+          LEFT JOIN (SELECT district_id, COUNT(*) AS students FROM students GROUP BY district_id) n
+            USING (district_id)
+          CROSS JOIN (SELECT range AS year FROM range({base_year}, {horizon + 1})) y
+          CROSS JOIN scenario_change sc
+          ORDER BY y.year, sc.scenario_id, d.district_id
+        ) TO '{out_dir}/forecast.csv' (HEADER)
+        """
+    )
+    with open(os.path.join(out_dir, "constraints.csv"), "w", encoding="utf-8") as f:
+        f.write("constraint_id,class_size_max,max_distance_km,min_condition_score\ndefault,25,3.0,3\n")
+    shutil.copyfile(
+        os.path.join(DATA_DIR, "dummy", "recommendation_rules.csv"), os.path.join(out_dir, "recommendation_rules.csv")
+    )
+    con.close()
+
+
+def build_database(source_dir, db_path, verbose=False):
+    if os.path.exists(db_path):
+        os.remove(db_path)
+    con = duckdb.connect(db_path)
+    try:
+        with open(SCHEMA_PATH, "r", encoding="utf-8") as f:
+            con.execute(f.read())
+        return ingest_directory(con, source_dir, verbose=verbose)
+    finally:
+        con.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate scaled synthetic planning data.")
+    parser.add_argument("out_dir", help="Directory to write CSV/Parquet sources to (replaced if it exists)")
+    parser.add_argument("--preset", choices=sorted(PRESETS), help="Named size")
+    parser.add_argument("--scale", type=float, help=f"Multiplier on the 1x unit {UNIT}")
+    parser.add_argument("--districts", type=int)
+    parser.add_argument("--schools", type=int)
+    parser.add_argument("--students", type=int, help="Students per year")
+    parser.add_argument("--history-years", type=int, default=1, help="Years of student register up to 2026")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--db", help="Also build a DuckDB database from the generated files")
+    args = parser.parse_args()
+
+    sizes = sizes_for(args.preset, args.scale, args.districts, args.schools, args.students)
+    generate(args.out_dir, sizes, history_years=args.history_years, seed=args.seed)
+    print(f"Wrote {args.out_dir} ({sizes['districts']} districts, {sizes['schools']} schools, "
+          f"{sizes['students']} students/year)")
+    if args.db:
+        build_database(args.out_dir, args.db, verbose=True)
+        print(f"Created {args.db}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,378 @@
+#!/usr/bin/env python3
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    import duckdb
+except Exception as e:
+    print("DuckDB Python package not installed.")
+    print("Activate a venv and run: pip install duckdb")
+    raise
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DATA_DIR = os.path.join(ROOT, "data")
+DB_PATH = os.path.join(DATA_DIR, "data.db")
+SCHEMA_PATH = os.path.join(DATA_DIR, "schema.sql")
+
+# Merge order follows the foreign keys in schema.sql.
+TABLES = ["districts", "scenarios", "schools", "constraints", "recommendation_rules", "students", "forecast"]
+
+# Year-partitioned tables: every REPLACE_KEYS value present in the input (a year,
+# or a year and scenario) replaces those rows in the database, others are left
+# untouched. Rows are written sorted on CLUSTER_KEYS so DuckDB's per-row-group
+# min/max can skip whole groups on year filters.
+CLUSTER_KEYS = {
+    "students": ["year", "district_id"],
+    "forecast": ["year", "scenario_id", "district_id"],
+}
+REPLACE_KEYS = {
+    "students": ["year"],
+    "forecast": ["year", "scenario_id"],
+}
+
+# Derived rows computed from a year-partitioned table, keyed on the same
+# REPLACE_KEYS: they describe the old rows, so they go when those are replaced.
+DERIVED_TABLES = {
+    "students": ["student_network_distance"],
+}
+
+# Unique keys that are not declared as PRIMARY KEY in schema.sql (see students).
+NATURAL_KEYS = {
+    "students": ["student_id", "year"],
+}
+
+STAGE = "ingest_stage"
+SOURCE_EXTENSIONS = (".csv", ".parquet")
+
+
+def quote(value):
+    return "'" + str(value).replace("'", "''") + "'"
+
+
+def find_sources(source_dir, table):
+    """Return `<table>.csv|parquet` plus any files inside a `<table>/` directory."""
+    files = []
+    for ext in SOURCE_EXTENSIONS:
+        path = os.path.join(source_dir, table + ext)
+        if os.path.isfile(path):
+            files.append(path)
+    table_dir = os.path.join(source_dir, table)
+    if os.path.isdir(table_dir):
+        for dirpath, _, filenames in os.walk(table_dir):
+            for name in sorted(filenames):
+                if name.endswith(SOURCE_EXTENSIONS):
+                    files.append(os.path.join(dirpath, name))
+    return files
+
+
+def table_columns(con, table):
+    return con.execute(
+        """
+        SELECT column_name, data_type
+        FROM duckdb_columns()
+        WHERE database_name = current_database() AND schema_name = 'main' AND table_name = ?
+        ORDER BY column_index
+        """,
+        [table],
+    ).fetchall()
+
+
+def primary_key(con, table):
+    row = con.execute(
+        """
+        SELECT constraint_column_names
+        FROM duckdb_constraints()
+        WHERE database_name = current_database() AND table_name = ? AND constraint_type = 'PRIMARY KEY'
+        """,
+        [table],
+    ).fetchone()
+    return list(row[0]) if row else NATURAL_KEYS.get(table, [])
+
+
+def foreign_keys(con, table):
+    return con.execute(
+        """
+        SELECT constraint_column_names, referenced_table, referenced_column_names
+        FROM duckdb_constraints()
+        WHERE database_name = current_database() AND table_name = ? AND constraint_type = 'FOREIGN KEY'
+        """,
+        [table],
+    ).fetchall()
+
+
+def staged_type(dtype):
+    # ENUM columns are staged as text, so a value missing from the ENUM becomes a
+    # validation error instead of a cast failure while reading.
+    return "VARCHAR" if dtype.startswith("ENUM") else dtype
+
+
+def reader_sql(files, columns):
+    """Build a SELECT over all input files that yields exactly the table's columns (ENUMs as text)."""
+    select_list = ", ".join(f"CAST({name} AS {staged_type(dtype)}) AS {name}" for name, dtype in columns)
+    parts = []
+    csv_files = [f for f in files if f.endswith(".csv")]
+    parquet_files = [f for f in files if f.endswith(".parquet")]
+    if csv_files:
+        # Explicit types: no sniffing, so a column that happens to look numeric in
+        # one year's file cannot change type in the next.
+        types = ", ".join(f"{quote(name)}: {quote(staged_type(dtype))}" for name, dtype in columns)
+        file_list = ", ".join(quote(f) for f in csv_files)
+        parts.append(
+            f"SELECT {select_list} FROM read_csv([{file_list}], header = true, delim = ',', "
+            f"union_by_name = true, types = {{{types}}})"
+        )
+    if parquet_files:
+        file_list = ", ".join(quote(f) for f in parquet_files)
+        parts.append(f"SELECT {select_list} FROM read_parquet([{file_list}], union_by_name = true)")
+    return " UNION ALL ".join(parts)
+
+
+def stage_table(con, table, files):
+    cur = con.cursor()
+    try:
+        columns = table_columns(cur, table)
+        started = time.perf_counter()
+        cur.execute(f"CREATE OR REPLACE TABLE {STAGE}.{table} AS {reader_sql(files, columns)}")
+        rows = cur.execute(f"SELECT COUNT(*) FROM {STAGE}.{table}").fetchone()[0]
+        return rows, time.perf_counter() - started
+    finally:
+        cur.close()
+
+
+def enum_columns(con, table):
+    return [(name, dtype) for name, dtype in table_columns(con, table) if dtype.startswith("ENUM")]
+
+
+def validate_enums(con, staged):
+    """Check staged ENUM columns for values the database's ENUM types do not have."""
+    errors = []
+    for table in staged:
+        for name, dtype in enum_columns(con, table):
+            unknown = con.execute(
+                f"SELECT list(DISTINCT {name} ORDER BY {name})[1:5] FROM {STAGE}.{table} "
+                f"WHERE {name} IS NOT NULL AND TRY_CAST({name} AS {dtype}) IS NULL"
+            ).fetchone()[0]
+            if unknown:
+                errors.append(
+                    f"{table}.{name}: {unknown} not in {dtype}; extend it in schema.sql and run "
+                    "scripts/migrate_schema.py"
+                )
+    return errors
+
+
+def cast_enums(con, staged):
+    for table in staged:
+        columns = enum_columns(con, table)
+        if columns:
+            casts = ", ".join(f"CAST({name} AS {dtype}) AS {name}" for name, dtype in columns)
+            con.execute(f"CREATE OR REPLACE TABLE {STAGE}.{table} AS SELECT * REPLACE ({casts}) FROM {STAGE}.{table}")
+
+
+def validate(con, staged):
+    """Check primary-key uniqueness and every foreign key against database + staged rows."""
+    errors = []
+    for table in staged:
+        pk = primary_key(con, table)
+        if pk:
+            cols = ", ".join(pk)
+            dupes = con.execute(
+                f"SELECT {cols}, COUNT(*) FROM {STAGE}.{table} GROUP BY {cols} HAVING COUNT(*) > 1 LIMIT 5"
+            ).fetchall()
+            if dupes:
+                errors.append(f"{table}: duplicate key ({cols}), e.g. {[d[:-1] for d in dupes]}")
+
+        for columns, ref_table, ref_columns in foreign_keys(con, table):
+            cols = ", ".join(columns)
+            ref_cols = ", ".join(ref_columns)
+            known = f"SELECT {ref_cols} FROM main.{ref_table}"
+            if ref_table in staged:
+                known += f" UNION SELECT {ref_cols} FROM {STAGE}.{ref_table}"
+            not_null = " AND ".join(f"s.{c} IS NOT NULL" for c in columns)
+            join_on = " AND ".join(f"k.{r} = s.{c}" for c, r in zip(columns, ref_columns))
+            missing, sample = con.execute(
+                f"""
+                SELECT COUNT(*), list(DISTINCT ({cols}))[1:5]
+                FROM {STAGE}.{table} s
+                WHERE {not_null}
+                  AND NOT EXISTS (SELECT 1 FROM ({known}) k WHERE {join_on})
+                """
+            ).fetchone()
+            if missing:
+                errors.append(f"{table}.{cols} -> {ref_table}.{ref_cols}: {missing} orphan rows, e.g. {sample}")
+    return errors
+
+
+def referencing_tables(con, table):
+    return con.execute(
+        """
+        SELECT table_name, constraint_column_names, referenced_column_names
+        FROM duckdb_constraints()
+        WHERE database_name = current_database() AND referenced_table = ? AND constraint_type = 'FOREIGN KEY'
+        """,
+        [table],
+    ).fetchall()
+
+
+def moved_rows(con, table):
+    """Foreign-key columns (outside the primary key) and a WHERE over `main.{table} t`
+    and `{STAGE}.{table} s` matching rows whose values for them change; None if none can.
+    """
+    pk = primary_key(con, table)
+    fk_columns = [c for columns, _, _ in foreign_keys(con, table) for c in columns if c not in pk]
+    if not pk or not fk_columns:
+        return None
+    join_on = " AND ".join(f"t.{c} = s.{c}" for c in pk)
+    changed = " OR ".join(f"t.{c} IS DISTINCT FROM s.{c}" for c in fk_columns)
+    return fk_columns, f"{join_on} AND ({changed})"
+
+
+def clear_moved_references(con, staged):
+    """Delete derived rows that reference rows whose foreign keys are about to change.
+
+    DuckDB cannot update a foreign-key column of a row that is still referenced, and
+    sees a delete and update in one transaction as still referenced, so these deletes
+    are committed before the merge. The derived tables (utilization, recommendations,
+    network distances) are rebuilt by the next recompute.
+    """
+    cleared = 0
+    for table in staged:
+        if table in CLUSTER_KEYS:
+            continue
+        moved = moved_rows(con, table)
+        if moved is None:
+            continue
+        keys = ", ".join(f"t.{c}" for c in primary_key(con, table))
+        moved = f"SELECT {keys} FROM main.{table} t JOIN {STAGE}.{table} s ON {moved[1]}"
+        if not con.execute(f"SELECT COUNT(*) FROM ({moved})").fetchone()[0]:
+            continue
+        for child, columns, ref_columns in referencing_tables(con, table):
+            if child in TABLES:
+                raise SystemExit(f"{table}: cannot change foreign keys of rows referenced by {child}")
+            match = " AND ".join(f"{child}.{c} = m.{r}" for c, r in zip(columns, ref_columns))
+            cleared += con.execute(
+                f"DELETE FROM main.{child} WHERE EXISTS (SELECT 1 FROM ({moved}) m WHERE {match})"
+            ).fetchone()[0]
+    return cleared
+
+
+def merge_table(con, table):
+    if table in CLUSTER_KEYS:
+        keys = ", ".join(REPLACE_KEYS[table])
+        replaced = f"({keys}) IN (SELECT DISTINCT ({keys}) FROM {STAGE}.{table})"
+        for derived in DERIVED_TABLES.get(table, ()):
+            if table_columns(con, derived):
+                con.execute(f"DELETE FROM main.{derived} WHERE {replaced}")
+        con.execute(f"DELETE FROM main.{table} WHERE {replaced}")
+        order_by = ", ".join(CLUSTER_KEYS[table])
+        con.execute(f"INSERT INTO main.{table} SELECT * FROM {STAGE}.{table} ORDER BY {order_by}")
+        return
+
+    # INSERT OR REPLACE deletes and reinserts rows with foreign keys, which DuckDB
+    # rejects while derived tables still reference them. Foreign-key columns are
+    # updated on their own (clear_moved_references has freed those rows) and the
+    # upsert only touches the remaining columns.
+    pk = primary_key(con, table)
+    fk_columns = {c for columns, _, _ in foreign_keys(con, table) for c in columns}
+    moved = moved_rows(con, table)
+    if moved is not None:
+        moved_fk, where = moved
+        assignments = ", ".join(f"{c} = s.{c}" for c in moved_fk)
+        con.execute(f"UPDATE main.{table} t SET {assignments} FROM {STAGE}.{table} s WHERE {where}")
+    columns = [name for name, _ in table_columns(con, table) if name not in pk and name not in fk_columns]
+    action = ", ".join(f"{c} = excluded.{c}" for c in columns)
+    con.execute(
+        f"INSERT INTO main.{table} SELECT * FROM {STAGE}.{table} "
+        f"ON CONFLICT ({', '.join(pk)}) DO {'UPDATE SET ' + action if action else 'NOTHING'}"
+    )
+
+
+def ingest_directory(con, source_dir, tables=None, workers=None, verbose=True):
+    """Load every `<table>.csv|parquet` (or `<table>/` directory) found in source_dir.
+
+    Files are read in parallel into an in-memory staging catalog, validated in
+    bulk and then merged into the database in a single transaction. Returns a
+    dict of per-table stats.
+    """
+    tables = tables or TABLES
+    sources = {t: find_sources(source_dir, t) for t in tables}
+    sources = {t: files for t, files in sources.items() if files}
+    if not sources:
+        raise SystemExit(f"No input files for {', '.join(tables)} found in {source_dir}")
+
+    con.execute(f"ATTACH IF NOT EXISTS ':memory:' AS {STAGE}")
+    stats = {}
+    try:
+        with ThreadPoolExecutor(max_workers=workers or min(len(sources), os.cpu_count() or 1)) as pool:
+            futures = {t: pool.submit(stage_table, con, t, files) for t, files in sources.items()}
+            for table, future in futures.items():
+                rows, seconds = future.result()
+                stats[table] = {"files": len(sources[table]), "rows": rows, "load_s": seconds}
+
+        staged = [t for t in TABLES if t in stats]
+        errors = validate_enums(con, staged)
+        if not errors:
+            cast_enums(con, staged)
+            errors = validate(con, staged)
+        if errors:
+            raise SystemExit("Validation failed:\n  " + "\n  ".join(errors))
+
+        cleared = clear_moved_references(con, staged)
+        if cleared and verbose:
+            print(f"Cleared {cleared} derived rows of moved records; recompute to rebuild them.")
+
+        con.execute("BEGIN TRANSACTION")
+        try:
+            for table in staged:
+                started = time.perf_counter()
+                merge_table(con, table)
+                stats[table]["merge_s"] = time.perf_counter() - started
+            con.execute("COMMIT")
+        except Exception:
+            con.execute("ROLLBACK")
+            raise
+    finally:
+        con.execute(f"DETACH {STAGE}")
+
+    if verbose:
+        print_report(stats)
+    return stats
+
+
+def print_report(stats):
+    print(f"{'table':<22}{'files':>6}{'rows':>12}{'load s':>9}{'merge s':>9}{'rows/s':>12}")
+    for table in TABLES:
+        s = stats.get(table)
+        if not s:
+            continue
+        total = s["load_s"] + s.get("merge_s", 0.0)
+        rate = s["rows"] / total if total > 0 else 0.0
+        print(
+            f"{table:<22}{s['files']:>6}{s['rows']:>12}{s['load_s']:>9.2f}{s.get('merge_s', 0.0):>9.2f}{rate:>12.0f}"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bulk-load CSV/Parquet inputs into the planning database.")
+    parser.add_argument("source_dir", help="Directory with <table>.csv|.parquet files or <table>/ subdirectories")
+    parser.add_argument("--db", default=DB_PATH, help=f"DuckDB database (default: {DB_PATH})")
+    parser.add_argument("--tables", nargs="+", choices=TABLES, help="Only load these tables")
+    parser.add_argument("--workers", type=int, help="Parallel file readers (default: one per table)")
+    args = parser.parse_args()
+
+    is_new = not os.path.exists(args.db)
+    con = duckdb.connect(args.db)
+    if is_new:
+        with open(SCHEMA_PATH, "r", encoding="utf-8") as f:
+            con.execute(f.read())
+    try:
+        ingest_directory(con, args.source_dir, tables=args.tables, workers=args.workers)
+    finally:
+        con.close()
+    print(f"{'Created' if is_new else 'Updated'} {args.db}")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+import argparse
+import math
+import sqlite3
+import sys
+
+# Extra margin around the clip box, in tiles at the lowest rebuilt zoom, so
+# features in the tile buffer of edge tiles are not cut off.
+CLIP_MARGIN_TILES = 1 / 16
+
+
+def parse_bbox(raw):
+    south, west, north, east = (float(v) for v in raw.split(","))
+    if south >= north or west >= east:
+        raise argparse.ArgumentTypeError("bbox must be south,west,north,east")
+    return south, west, north, east
+
+
+def parse_zoom(raw):
+    low, _, high = raw.partition("-")
+    low = int(low)
+    high = int(high) if high else low
+    if not 0 <= low <= high <= 24:
+        raise argparse.ArgumentTypeError("zoom must be MIN-MAX within 0-24")
+    return low, high
+
+
+def tile_x(lon, z):
+    return min(2**z - 1, max(0, int((lon + 180.0) / 360.0 * 2**z)))
+
+
+def tile_y(lat, z):
+    lat = max(-85.0511, min(85.0511, lat))
+    y = (1.0 - math.asinh(math.tan(math.radians(lat))) / math.pi) / 2.0 * 2**z
+    return min(2**z - 1, max(0, int(y)))
+
+
+def tile_lon(x, z):
+    return x / 2**z * 360.0 - 180.0
+
+
+def tile_lat(y, z):
+    return math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * y / 2**z))))
+
+
+def tile_range(bbox, z):
+    """Inclusive XYZ column/row range of the tiles intersecting bbox at zoom z."""
+    south, west, north, east = bbox
+    return tile_x(west, z), tile_x(east, z), tile_y(north, z), tile_y(south, z)
+
+
+def clip_box(bbox, z):
+    """Bounds of the zoom-z tiles covering bbox, plus a margin: minlon,minlat,maxlon,maxlat."""
+    x0, x1, y0, y1 = tile_range(bbox, z)
+    margin = CLIP_MARGIN_TILES
+    return (
+        max(-180.0, tile_lon(x0 - margin, z)),
+        max(-85.0511, tile_lat(y1 + 1 + margin, z)),
+        min(180.0, tile_lon(x1 + 1 + margin, z)),
+        min(85.0511, tile_lat(y0 - margin, z)),
+    )
+
+
+def metadata_zooms(con, schema="main"):
+    rows = dict(con.execute(f"SELECT name, value FROM {schema}.metadata WHERE name IN ('minzoom', 'maxzoom')"))
+    return int(rows["minzoom"]), int(rows["maxzoom"])
+
+
+def check_tiles_table(con, schema="main"):
+    kind = con.execute(f"SELECT type FROM {schema}.sqlite_master WHERE name = 'tiles'").fetchone()
+    if not kind or kind[0] != "table":
+        raise SystemExit("Only MBTiles with a plain `tiles` table can be patched; run a full build instead.")
+
+
+def plan(args):
+    con = sqlite3.connect(args.mbtiles)
+    try:
+        low, high = args.zoom or metadata_zooms(con)
+    finally:
+        con.close()
+    parts = [f"-Z{low}", f"-z{high}"]
+    if args.bbox:
+        parts.append("--clip-bounding-box=" + ",".join(f"{v:.7f}" for v in clip_box(args.bbox, low)))
+    print(" ".join(parts))
+
+
+def patch(args):
+    con = sqlite3.connect(args.mbtiles)
+    try:
+        con.execute("ATTACH DATABASE ? AS partial", [args.partial])
+        check_tiles_table(con)
+        check_tiles_table(con, "partial")
+        low, high = args.zoom or metadata_zooms(con, "partial")
+        replaced = added = 0
+        with con:
+            for z in range(low, high + 1):
+                where = "zoom_level = ?"
+                params = [z]
+                if args.bbox:
+                    x0, x1, y0, y1 = tile_range(args.bbox, z)
+                    # MBTiles rows are TMS: counted from the bottom.
+                    where += " AND tile_column BETWEEN ? AND ? AND tile_row BETWEEN ? AND ?"
+                    params += [x0, x1, 2**z - 1 - y1, 2**z - 1 - y0]
+                replaced += con.execute(f"DELETE FROM main.tiles WHERE {where}", params).rowcount
+                added += con.execute(
+                    "INSERT INTO main.tiles (zoom_level, tile_column, tile_row, tile_data) "
+                    f"SELECT zoom_level, tile_column, tile_row, tile_data FROM partial.tiles WHERE {where}",
+                    params,
+                ).rowcount
+            old_low, old_high = metadata_zooms(con)
+            con.execute("UPDATE main.metadata SET value = ? WHERE name = 'minzoom'", [str(min(old_low, low))])
+            con.execute("UPDATE main.metadata SET value = ? WHERE name = 'maxzoom'", [str(max(old_high, high))])
+    finally:
+        con.close()
+    print(f"  {args.mbtiles}: replaced {replaced} tiles with {added} (z{low}-{high})")
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Replace a bbox/zoom window of an MBTiles tileset with a partial build (used by build_pmtiles.sh)."
+    )
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("plan", help="Print tippecanoe zoom/clip arguments for a partial build")
+    p.add_argument("mbtiles", help="Existing tileset (for its zoom range)")
+    p.add_argument("--bbox", type=parse_bbox, help="south,west,north,east")
+    p.add_argument("--zoom", type=parse_zoom, help="MIN-MAX (default: the tileset's zoom range)")
+    p.set_defaults(func=plan)
+
+    p = sub.add_parser("patch", help="Copy the window from a partial build into an existing tileset")
+    p.add_argument("mbtiles")
+    p.add_argument("partial")
+    p.add_argument("--bbox", type=parse_bbox, help="south,west,north,east")
+    p.add_argument("--zoom", type=parse_zoom, help="MIN-MAX (default: the partial build's zoom range)")
+    p.set_defaults(func=patch)
+
+    args = parser.parse_args()
+    args.func(args)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
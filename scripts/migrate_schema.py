@@ -0,0 +1,210 @@
+#!/usr/bin/env python3
+import argparse
+import os
+import re
+import sys
+
+try:
+    import duckdb
+except Exception as e:
+    print("DuckDB Python package not installed.")
+    print("Activate a venv and run: pip install duckdb")
+    raise
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DATA_DIR = os.path.join(ROOT, "data")
+DB_PATH = os.path.join(DATA_DIR, "data.db")
+SCHEMA_PATH = os.path.join(DATA_DIR, "schema.sql")
+DEFAULT_RULES_PATH = os.path.join(DATA_DIR, "dummy", "recommendation_rules.csv")
+
+# Copy order follows the foreign keys. Every table is rewritten sorted on the
+# columns the API filters on, so per-row-group min/max statistics let
+# `WHERE year = ? AND scenario_id = ?` skip everything but the matching blocks.
+TABLES = [
+    ("districts", "district_id"),
+    ("scenarios", "scenario_id"),
+    ("schools", "district_id, school_id"),
+    ("constraints", "constraint_id"),
+    ("users", "user_id"),
+    ("students", "year, district_id"),
+    ("forecast", "year, scenario_id, district_id"),
+    ("district_capacity", "year, scenario_id, district_id"),
+    ("school_utilization", "year, scenario_id, school_id"),
+    # Added after v2; copied when the source has them (ENUM rebuilds).
+    ("recommendation_rules", "constraint_id, rule_id"),
+    ("school_network_snap", "mode, school_id"),
+    ("school_network_distance", "mode, school_a, school_b"),
+    ("student_network_distance", "mode, year, nearest_school_id"),
+]
+
+ENUM_RE = re.compile(r"CREATE\s+TYPE\s+(\w+)\s+AS\s+ENUM\s*\(([^)]*)\)", re.IGNORECASE)
+
+
+def schema_version(con, catalog):
+    dtype = con.execute(
+        """
+        SELECT data_type FROM duckdb_columns()
+        WHERE database_name = ? AND table_name = 'recommendations' AND column_name = 'rec_id'
+        """,
+        [catalog],
+    ).fetchone()
+    if dtype is None:
+        raise SystemExit(f"{catalog}: no recommendations table, not a planning database")
+    return 2 if dtype[0] == "BIGINT" else 1
+
+
+def read_schema():
+    with open(SCHEMA_PATH, "r", encoding="utf-8") as f:
+        return "\n".join(line for line in f if not line.lstrip().startswith("--"))
+
+
+def enum_drift(con):
+    """ENUM types whose labels in schema.sql differ from the database's.
+
+    DuckDB cannot add labels to an existing ENUM, so these need a rebuild.
+    """
+    drifted = []
+    for name, labels in ENUM_RE.findall(read_schema()):
+        wanted = [label.replace("''", "'") for label in re.findall(r"'((?:[^']|'')*)'", labels)]
+        try:
+            current = con.execute(f"SELECT enum_range(NULL::{name})").fetchone()[0]
+        except duckdb.CatalogException:
+            continue  # added by add_missing_objects
+        if list(current) != wanted:
+            drifted.append(name)
+    return drifted
+
+
+def add_missing_objects(con):
+    """Create types, sequences and tables from schema.sql that the database does not have yet."""
+    schema = read_schema()
+    catalogs = {
+        "TYPE": "SELECT type_name FROM duckdb_types() WHERE database_name = current_database()",
+        "SEQUENCE": "SELECT sequence_name FROM duckdb_sequences() WHERE database_name = current_database()",
+        "TABLE": "SELECT table_name FROM duckdb_tables() WHERE database_name = current_database()",
+    }
+    existing = {kind: {row[0] for row in con.execute(sql).fetchall()} for kind, sql in catalogs.items()}
+    added = []
+    for statement in schema.split(";"):
+        match = re.match(r"\s*CREATE\s+(TYPE|SEQUENCE|TABLE)\s+(\w+)", statement, re.IGNORECASE)
+        if match and match.group(2) not in existing[match.group(1).upper()]:
+            con.execute(statement)
+            added.append(match.group(2))
+    return added
+
+
+def seed_rules(con):
+    """Give every constraint set without recommendation rules the default rule set."""
+    before = con.execute("SELECT COUNT(*) FROM recommendation_rules").fetchone()[0]
+    con.execute(
+        """
+        INSERT INTO recommendation_rules BY NAME
+        SELECT r.* REPLACE (c.constraint_id AS constraint_id)
+        FROM read_csv(?, header = true) r
+        CROSS JOIN constraints c
+        WHERE r.constraint_id = 'default'
+          AND c.constraint_id NOT IN (SELECT constraint_id FROM recommendation_rules)
+        """,
+        [DEFAULT_RULES_PATH],
+    )
+    return con.execute("SELECT COUNT(*) FROM recommendation_rules").fetchone()[0] - before
+
+
+def migrate(src_path, dst_path, version):
+    """Copy every table of src_path into a new database built from schema.sql."""
+    con = duckdb.connect(dst_path)
+    try:
+        quoted = src_path.replace("'", "''")
+        con.execute(f"ATTACH '{quoted}' AS old (READ_ONLY)")
+        schema = read_schema()
+        if version == 2:
+            # Keep rec_ids stable: start the new sequence after the copied ones.
+            next_id = con.execute("SELECT COALESCE(MAX(rec_id), 0) + 1 FROM old.recommendations").fetchone()[0]
+            schema = re.sub(r"CREATE SEQUENCE rec_id_seq\b", f"CREATE SEQUENCE rec_id_seq START WITH {next_id}", schema)
+        con.execute(schema)
+        tables_sql = "SELECT table_name FROM duckdb_tables() WHERE database_name = 'old'"
+        old_tables = {row[0] for row in con.execute(tables_sql).fetchall()}
+
+        con.execute("BEGIN TRANSACTION")
+        for table, order_by in TABLES:
+            if table not in old_tables:
+                continue
+            con.execute(f"INSERT INTO main.{table} BY NAME SELECT * FROM old.{table} ORDER BY {order_by}")
+            count = con.execute(f"SELECT COUNT(*) FROM main.{table}").fetchone()[0]
+            print(f"  {table:<24}{count:>10} rows")
+
+        if version == 2:
+            con.execute(
+                "INSERT INTO main.recommendations BY NAME SELECT * FROM old.recommendations "
+                "ORDER BY year, scenario_id, rec_id"
+            )
+        else:
+            # Old ids look like rec_<year>_<scenario>_<n>; renumber from rec_id_seq in
+            # the order the API used to list them.
+            con.execute(
+                """
+                INSERT INTO main.recommendations BY NAME
+                SELECT * EXCLUDE (rec_id)
+                FROM old.recommendations
+                ORDER BY year, scenario_id, TRY_CAST(regexp_extract(rec_id, '_(\\d+)$', 1) AS INTEGER), rec_id
+                """
+            )
+        count = con.execute("SELECT COUNT(*) FROM main.recommendations").fetchone()[0]
+        print(f"  {'recommendations':<24}{count:>10} rows")
+        print(f"  {'recommendation_rules':<24}{seed_rules(con):>10} rows (defaults)")
+        con.execute("COMMIT")
+        con.execute("DETACH old")
+        con.execute("CHECKPOINT")
+    finally:
+        con.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Migrate data.db to the current schema.sql (ENUM keys, sorted storage).")
+    parser.add_argument("--db", default=DB_PATH, help=f"Database to migrate in place (default: {DB_PATH})")
+    args = parser.parse_args()
+
+    if not os.path.exists(args.db):
+        raise SystemExit(f"Database not found at {args.db}")
+
+    con = duckdb.connect(args.db)
+    try:
+        version = schema_version(con, con.execute("SELECT current_database()").fetchone()[0])
+        drifted = enum_drift(con) if version == 2 else []
+        if version == 2 and not drifted:
+            added = add_missing_objects(con)
+            seeded = seed_rules(con)
+            if seeded:
+                added.append(f"{seeded} default recommendation rules")
+            print(f"{args.db} already uses the current schema" + (f"; added {', '.join(added)}" if added else ""))
+            return 0
+    finally:
+        con.close()
+
+    tmp_path = args.db + ".migrating"
+    backup_path = args.db + f".v{version}.bak"
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+
+    if drifted:
+        print(f"Rebuilding {args.db}: ENUM {', '.join(drifted)} changed in schema.sql")
+    else:
+        print(f"Migrating {args.db}")
+    try:
+        migrate(args.db, tmp_path, version)
+    except duckdb.ConversionException as exc:
+        os.remove(tmp_path)
+        raise SystemExit(f"{exc}\nA value in {args.db} is missing from an ENUM in schema.sql; add it back.") from exc
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+    os.replace(args.db, backup_path)
+    os.replace(tmp_path, args.db)
+    print(f"Migrated {args.db} (previous version kept at {backup_path})")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,7 @@
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+for path in (ROOT / "app", ROOT / "scripts"):
+    if str(path) not in sys.path:
+        sys.path.insert(0, str(path))
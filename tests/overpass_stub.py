@@ -0,0 +1,60 @@
+"""Minimal Overpass interpreter stand-in for fetch_goteborg_osm.py.
+
+Answers every POSTed query with the elements `elements(bbox)` returns for the
+query's bounding box, pretty-printed like Overpass does. The first `fail_first`
+requests get a 200 response with a runtime-error remark instead.
+"""
+import json
+import re
+import threading
+import urllib.parse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+BBOX_RE = re.compile(r"\(([-\d.]+),([-\d.]+),([-\d.]+),([-\d.]+)\)")
+
+
+class OverpassStub:
+    def __init__(self, elements, fail_first=0):
+        self.elements = elements
+        self.fail_first = fail_first
+        self.requests = []
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        host, port = self._server.server_address
+        self.url = f"http://{host}:{port}/api/interpreter"
+
+    def _handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers["Content-Length"])).decode("utf-8")
+                query = urllib.parse.parse_qs(body)["data"][0]
+                bbox = tuple(float(v) for v in BBOX_RE.search(query).groups())
+                with stub._lock:
+                    stub.requests.append(bbox)
+                    failing = len(stub.requests) <= stub.fail_first
+                document = {"version": 0.6, "generator": "overpass-stub", "elements": []}
+                if failing:
+                    document["remark"] = 'runtime error: Query timed out in "query" at line 3 after 90 seconds.'
+                else:
+                    document["elements"] = stub.elements(bbox)
+                payload = json.dumps(document, indent=1).encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
+
+    def __enter__(self):
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc):
+        self._server.shutdown()
+        self._server.server_close()
@@ -0,0 +1,103 @@
+import io
+import json
+import sys
+
+import pytest
+
+import fetch_goteborg_osm as fetch
+from overpass_stub import OverpassStub
+
+
+def way(way_id, tags, *points):
+    return {"type": "way", "id": way_id, "tags": tags, "geometry": [{"lat": lat, "lon": lon} for lat, lon in points]}
+
+
+def square(way_id, tags, lat, lon, size=0.1):
+    return way(way_id, tags, (lat, lon), (lat + size, lon), (lat + size, lon + size), (lat, lon + size), (lat, lon))
+
+
+def two_tile_elements(bbox):
+    """Elements for the tiles of 0,0,1,2 split at lon 1; ways 1 and 2 reach into both tiles."""
+    south, west, north, east = bbox
+    elements = [
+        way(1, {"highway": "primary", "name": 'Gata "]["'}, (0.5, 0.5), (0.5, 1.5)),
+        # Touches the shared edge: Overpass bboxes are inclusive.
+        way(2, {"waterway": "stream"}, (0.2, 0.8), (0.2, 1.0)),
+    ]
+    elements.append(square(10 + int(west), {"building": "yes"}, 0.4, west + 0.4))
+    elements.append({"type": "node", "id": 99, "lat": 0.5, "lon": west + 0.5, "tags": {"amenity": "bench"}})
+    return elements
+
+
+def features(out_dir, layer):
+    with (out_dir / f"{layer}.geojson").open(encoding="utf-8") as f:
+        return [json.loads(line) for line in f]
+
+
+def run_main(monkeypatch, tmp_path, endpoint, *extra):
+    argv = ["fetch_goteborg_osm.py", "--bbox", "0,0,1,2", "--tile-deg", "1", "--endpoint", endpoint]
+    argv += ["--cache-dir", str(tmp_path / "cache"), "--out-dir", str(tmp_path / "raw"), *extra]
+    monkeypatch.setattr(sys, "argv", argv)
+    (tmp_path / "cache").mkdir(exist_ok=True)
+    fetch.main()
+
+
+@pytest.fixture(autouse=True)
+def no_backoff(monkeypatch):
+    monkeypatch.setattr(fetch.time, "sleep", lambda seconds: None)
+
+
+def test_split_bbox_covers_bbox():
+    assert fetch.split_bbox("0,0,1,2", 1) == ["0.00000,0.00000,1.00000,1.00000", "0.00000,1.00000,1.00000,2.00000"]
+
+
+def test_edge_ways_written_once(monkeypatch, tmp_path):
+    with OverpassStub(two_tile_elements) as stub:
+        run_main(monkeypatch, tmp_path, stub.url)
+    assert len(stub.requests) == 2
+
+    raw = tmp_path / "raw"
+    assert [f["properties"]["id"] for f in features(raw, "roads")] == [1]
+    assert features(raw, "roads")[0]["properties"]["name"] == 'Gata "]["'
+    assert [f["properties"]["id"] for f in features(raw, "water_lines")] == [2]
+    assert sorted(f["properties"]["id"] for f in features(raw, "buildings")) == [10, 11]
+    assert not list(raw.glob("*.part"))
+
+
+def test_cached_tiles_are_reused(monkeypatch, tmp_path):
+    with OverpassStub(two_tile_elements) as stub:
+        run_main(monkeypatch, tmp_path, stub.url)
+        first = sorted(features(tmp_path / "raw", "buildings"), key=str)
+        run_main(monkeypatch, tmp_path, stub.url)
+        assert len(stub.requests) == 2
+        run_main(monkeypatch, tmp_path, stub.url, "--refresh")
+        assert len(stub.requests) == 4
+    assert len(list((tmp_path / "cache").glob("*.json"))) == 2
+    # Tiles are converted in completion order, so compare the features, not the file.
+    assert sorted(features(tmp_path / "raw", "buildings"), key=str) == first
+
+
+def test_runtime_error_remark_is_retried_and_not_cached(tmp_path):
+    tile = "0.00000,0.00000,1.00000,1.00000"
+    with OverpassStub(two_tile_elements, fail_first=1) as stub:
+        path, source = fetch.fetch_tile(tile, [stub.url], tmp_path)
+    assert source == stub.url
+    assert len(stub.requests) == 2
+    assert fetch.overpass_remark(path) is None
+    assert [p.name for p in tmp_path.iterdir()] == [path.name]
+
+    failing = tmp_path / "failing"
+    failing.mkdir()
+    with OverpassStub(two_tile_elements, fail_first=3) as stub:
+        with pytest.raises(SystemExit, match="runtime error"):
+            fetch.fetch_tile(tile, [stub.url], failing)
+    assert len(stub.requests) == 3
+    assert not list(failing.iterdir())
+
+
+@pytest.mark.parametrize("chunk_size", [1, 7, 64])
+def test_iter_elements_small_chunks(chunk_size):
+    elements = two_tile_elements((0, 0, 1, 1)) + [{"type": "way", "id": 5, "tags": {"note": "a\\\"b}, {"}}]
+    text = json.dumps({"version": 0.6, "osm3s": {"note": "[elements]"}, "elements": elements}, indent=1)
+    assert list(fetch.iter_elements(io.StringIO(text), chunk_size)) == elements
+    assert list(fetch.iter_elements(io.StringIO('{"elements": [ ]}'), chunk_size)) == []
@@ -0,0 +1,205 @@
+import csv
+import os
+import shutil
+
+import duckdb
+import pytest
+
+import ingest
+import server
+
+DUMMY_DIR = os.path.join(ingest.DATA_DIR, "dummy")
+
+
+def recompute(db_path, monkeypatch):
+    monkeypatch.setattr(server, "DB_PATH", db_path)
+    monkeypatch.setattr(server, "_db", None)
+    try:
+        server.build_recommendations()
+    finally:
+        server._db.close()
+
+
+def scalar(db_path, sql):
+    con = duckdb.connect(str(db_path))
+    try:
+        return con.execute(sql).fetchone()[0]
+    finally:
+        con.close()
+
+
+def ingest_into(db_path, source_dir):
+    con = duckdb.connect(str(db_path))
+    try:
+        return ingest.ingest_directory(con, str(source_dir), verbose=False)
+    finally:
+        con.close()
+
+
+def rewrite_csv(path, change):
+    with open(path, newline="", encoding="utf-8") as f:
+        rows = list(csv.DictReader(f))
+    rows = [row for row in map(change, rows) if row]
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=list(rows[0]))
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+@pytest.fixture
+def recomputed_db(tmp_path, monkeypatch):
+    db_path = tmp_path / "data.db"
+    con = duckdb.connect(str(db_path))
+    with open(ingest.SCHEMA_PATH, encoding="utf-8") as f:
+        con.execute(f.read())
+    ingest.ingest_directory(con, DUMMY_DIR, verbose=False)
+    con.execute("INSERT INTO school_network_snap VALUES ('walk', 'S1', 0.1, 3.0), ('walk', 'S2', 0.1, 3.0)")
+    con.execute("INSERT INTO school_network_distance VALUES ('walk', 'S1', 'S2', 2.5), ('walk', 'S2', 'S1', 2.5)")
+    con.close()
+    recompute(db_path, monkeypatch)
+    assert scalar(db_path, "SELECT COUNT(*) FROM school_utilization") > 0
+    return db_path
+
+
+def test_reingest_into_recomputed_db(recomputed_db, monkeypatch):
+    recommendations = scalar(recomputed_db, "SELECT COUNT(*) FROM recommendations")
+
+    ingest_into(recomputed_db, DUMMY_DIR)
+
+    assert scalar(recomputed_db, "SELECT COUNT(*) FROM schools") == 3
+    # Unchanged foreign keys leave the derived tables alone.
+    assert scalar(recomputed_db, "SELECT COUNT(*) FROM recommendations") == recommendations
+    assert scalar(recomputed_db, "SELECT COUNT(*) FROM school_network_snap") == 2
+    recompute(recomputed_db, monkeypatch)
+
+
+def test_reingest_updates_referenced_school(recomputed_db, tmp_path, monkeypatch):
+    source = tmp_path / "in"
+    source.mkdir()
+    shutil.copy(os.path.join(DUMMY_DIR, "schools.csv"), source)
+
+    def move_s1(row):
+        if row["school_id"] == "S1":
+            row.update(district_id="D2", capacity_total="500")
+        elif row["school_id"] == "S2":
+            row["capacity_total"] = "400"
+        return row
+
+    rewrite_csv(source / "schools.csv", move_s1)
+    ingest_into(recomputed_db, source)
+
+    assert scalar(recomputed_db, "SELECT district_id || capacity_total FROM schools WHERE school_id = 'S1'") == "D2500"
+    assert scalar(recomputed_db, "SELECT capacity_total FROM schools WHERE school_id = 'S2'") == 400
+    # Rows referencing the moved school are cleared, the others kept.
+    assert scalar(recomputed_db, "SELECT COUNT(*) FROM school_utilization WHERE school_id = 'S1'") == 0
+    assert scalar(recomputed_db, "SELECT COUNT(*) FROM school_utilization WHERE school_id = 'S2'") > 0
+    assert scalar(recomputed_db, "SELECT COUNT(*) FROM school_network_distance") == 0
+    assert scalar(recomputed_db, "SELECT COUNT(*) FROM school_network_snap") == 1
+    recompute(recomputed_db, monkeypatch)
+    assert scalar(recomputed_db, "SELECT COUNT(*) FROM school_utilization WHERE school_id = 'S1'") > 0
+
+
+def test_forecast_replaces_only_input_scenarios(recomputed_db, tmp_path):
+    source = tmp_path / "in"
+    source.mkdir()
+    shutil.copy(os.path.join(DUMMY_DIR, "forecast.csv"), source)
+    rewrite_csv(
+        source / "forecast.csv",
+        lambda row: dict(row, expected_students="1") if row["scenario_id"] == "base" else None,
+    )
+    before = scalar(recomputed_db, "SELECT COUNT(*) FROM forecast WHERE scenario_id <> 'base'")
+
+    ingest_into(recomputed_db, source)
+
+    assert scalar(recomputed_db, "SELECT COUNT(*) FROM forecast WHERE scenario_id <> 'base'") == before
+    assert scalar(recomputed_db, "SELECT MAX(expected_students) FROM forecast WHERE scenario_id = 'base'") == 1
+
+
+@pytest.fixture
+def fresh_db(tmp_path):
+    db_path = tmp_path / "fresh.db"
+    con = duckdb.connect(str(db_path))
+    with open(ingest.SCHEMA_PATH, encoding="utf-8") as f:
+        con.execute(f.read())
+    con.close()
+    return db_path
+
+
+def write_students(path, year, ids):
+    """A register for one year in the layout of data/dummy/students.csv, as CSV or Parquet."""
+    rows = ", ".join(f"('{student_id}', 9, {year}, 'D1', 11.96, 57.71)" for student_id in ids)
+    con = duckdb.connect()
+    try:
+        fmt = "PARQUET" if path.suffix == ".parquet" else "CSV, HEADER"
+        con.execute(
+            f"COPY (SELECT * FROM (VALUES {rows}) t(student_id, age, year, district_id, x_lon, y_lat)) "
+            f"TO '{path}' (FORMAT {fmt})"
+        )
+    finally:
+        con.close()
+
+
+def test_directory_of_mixed_files_loads_in_parallel(fresh_db, tmp_path):
+    source = tmp_path / "in"
+    (source / "students" / "older").mkdir(parents=True)
+    for name in ("districts", "schools", "scenarios"):
+        shutil.copy(os.path.join(DUMMY_DIR, f"{name}.csv"), source)
+    write_students(source / "students" / "older" / "2024.parquet", 2024, ["E1", "E2"])
+    write_students(source / "students" / "2025.parquet", 2025, ["E1", "E2", "E3"])
+    write_students(source / "students" / "2026.csv", 2026, ["E1"])
+
+    con = duckdb.connect(str(fresh_db))
+    try:
+        stats = ingest.ingest_directory(con, str(source), workers=4, verbose=False)
+        assert stats["students"]["files"] == 3 and stats["students"]["rows"] == 6
+        assert con.execute("SELECT year, COUNT(*) FROM students GROUP BY year ORDER BY year").fetchall() == [
+            (2024, 2),
+            (2025, 3),
+            (2026, 1),
+        ]
+        assert con.execute("SELECT COUNT(*) FROM schools").fetchone()[0] == 3
+    finally:
+        con.close()
+
+
+@pytest.mark.parametrize(
+    "change, message",
+    [
+        (lambda row: dict(row, district_id="D9") if row["school_id"] == "S1" else row, r"orphan rows, e.g. \['D9'\]"),
+        (lambda row: dict(row, school_id="S1"), r"schools: duplicate key \(school_id\)"),
+    ],
+)
+def test_validation_failures_write_nothing(recomputed_db, tmp_path, change, message):
+    source = tmp_path / "in"
+    source.mkdir()
+    shutil.copy(os.path.join(DUMMY_DIR, "schools.csv"), source)
+    rewrite_csv(source / "schools.csv", lambda row: dict(change(row), capacity_total="1"))
+    before = scalar(recomputed_db, "SELECT SUM(capacity_total) FROM schools")
+
+    with pytest.raises(SystemExit, match=message):
+        ingest_into(recomputed_db, source)
+
+    assert scalar(recomputed_db, "SELECT SUM(capacity_total) FROM schools") == before
+
+
+def test_students_replaced_per_year(recomputed_db, tmp_path):
+    con = duckdb.connect(str(recomputed_db))
+    con.execute("INSERT INTO students SELECT * REPLACE (2025 AS year) FROM students WHERE year = 2026")
+    con.execute(
+        "INSERT INTO student_network_distance SELECT 'walk', year, student_id, 'S1', 0.5 FROM students"
+    )
+    con.close()
+    source = tmp_path / "in"
+    (source / "students").mkdir(parents=True)
+    write_students(source / "students" / "2026.parquet", 2026, ["N1", "N2"])
+
+    ingest_into(recomputed_db, source)
+
+    assert scalar(recomputed_db, "SELECT list(student_id ORDER BY student_id) FROM students WHERE year = 2026") == [
+        "N1",
+        "N2",
+    ]
+    assert scalar(recomputed_db, "SELECT COUNT(*) FROM students WHERE year = 2025") == 4
+    # Network distances of the replaced register are gone, other years keep theirs.
+    assert scalar(recomputed_db, "SELECT COUNT(*) FROM student_network_distance WHERE year = 2026") == 0
+    assert scalar(recomputed_db, "SELECT COUNT(*) FROM student_network_distance WHERE year = 2025") == 4
@@ -0,0 +1,99 @@
+import os
+import sys
+
+import duckdb
+import pytest
+
+import ingest
+import migrate_schema
+
+DUMMY_DIR = os.path.join(ingest.DATA_DIR, "dummy")
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    path = str(tmp_path / "data.db")
+    con = duckdb.connect(path)
+    with open(ingest.SCHEMA_PATH, encoding="utf-8") as f:
+        con.execute(f.read())
+    ingest.ingest_directory(con, DUMMY_DIR, verbose=False)
+    con.execute(
+        "INSERT INTO recommendations (year, scenario_id, district_id, action_type, reason) "
+        "VALUES (2026, 'base', 'D1', 'new_build', 'a'), (2026, 'low', 'D2', 'resize', 'b')"
+    )
+    con.close()
+    return path
+
+
+def edited_schema(tmp_path, monkeypatch, old, new):
+    with open(migrate_schema.SCHEMA_PATH, encoding="utf-8") as f:
+        schema = f.read()
+    assert old in schema
+    path = tmp_path / "schema.sql"
+    path.write_text(schema.replace(old, new), encoding="utf-8")
+    monkeypatch.setattr(migrate_schema, "SCHEMA_PATH", str(path))
+
+
+def run_migration(monkeypatch, db_path):
+    monkeypatch.setattr(sys, "argv", ["migrate_schema.py", "--db", db_path])
+    return migrate_schema.main()
+
+
+def test_current_database_is_left_alone(db_path, monkeypatch, capsys):
+    run_migration(monkeypatch, db_path)
+    assert "already uses the current schema" in capsys.readouterr().out
+    assert not os.path.exists(db_path + ".v2.bak")
+
+
+def test_extended_enum_rebuilds_database(db_path, tmp_path, monkeypatch):
+    edited_schema(tmp_path, monkeypatch, "('base', 'low', 'high')", "('base', 'low', 'high', 'mid')")
+    con = duckdb.connect(db_path)
+    before = {t: con.execute(f"SELECT COUNT(*) FROM {t}").fetchone()[0] for t in ("forecast", "recommendation_rules")}
+    rec_ids = con.execute("SELECT rec_id FROM recommendations ORDER BY rec_id").fetchall()
+    con.close()
+
+    run_migration(monkeypatch, db_path)
+
+    assert os.path.exists(db_path + ".v2.bak")
+    con = duckdb.connect(db_path)
+    try:
+        assert migrate_schema.enum_drift(con) == []
+        for table, count in before.items():
+            assert con.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0] == count
+        assert con.execute("SELECT rec_id FROM recommendations ORDER BY rec_id").fetchall() == rec_ids
+
+        source = tmp_path / "in"
+        source.mkdir()
+        (source / "scenarios.csv").write_text("scenario_id,name\nmid,Mellan\n", encoding="utf-8")
+        ingest.ingest_directory(con, str(source), verbose=False)
+        con.execute(
+            "INSERT INTO recommendations (year, scenario_id, district_id, action_type, reason) "
+            "VALUES (2026, 'mid', 'D1', 'resize', 'c')"
+        )
+        assert con.execute("SELECT MAX(rec_id) FROM recommendations").fetchone()[0] == rec_ids[-1][0] + 1
+    finally:
+        con.close()
+
+
+def test_removed_enum_label_in_use_keeps_database(db_path, tmp_path, monkeypatch):
+    edited_schema(tmp_path, monkeypatch, "('base', 'low', 'high')", "('base', 'high')")
+    with pytest.raises(SystemExit, match="missing from an ENUM"):
+        run_migration(monkeypatch, db_path)
+    assert not os.path.exists(db_path + ".migrating")
+    con = duckdb.connect(db_path)
+    try:
+        assert con.execute("SELECT COUNT(*) FROM scenarios WHERE scenario_id = 'low'").fetchone()[0] == 1
+    finally:
+        con.close()
+
+
+def test_ingest_reports_unknown_enum_value(db_path, tmp_path):
+    source = tmp_path / "in"
+    source.mkdir()
+    (source / "scenarios.csv").write_text("scenario_id,name\nmid,Mellan\n", encoding="utf-8")
+    con = duckdb.connect(db_path)
+    try:
+        with pytest.raises(SystemExit, match=r"scenarios.scenario_id: \['mid'\] not in ENUM"):
+            ingest.ingest_directory(con, str(source), verbose=False)
+    finally:
+        con.close()
@@ -0,0 +1,120 @@
+import json
+
+import pytest
+
+import routing
+from build_road_graph import school_pairs
+
+
+def road(highway, *points, **tags):
+    return {
+        "type": "Feature",
+        "properties": {"highway": highway, **tags},
+        "geometry": {"type": "LineString", "coordinates": [[lon, lat] for lat, lon in points]},
+    }
+
+
+ROADS = [
+    # (0, 0.001) is only shape: folded into the A edge.
+    road("residential", (0, 0), (0, 0.001), (0, 0.002), (0, 0.003)),
+    # Crosses A at (0, 0.002) without being split there in the input.
+    road("footway", (-0.001, 0.002), (0, 0.002), (0.001, 0.002)),
+    road("motorway", (0, 0.003), (0, 0.006)),
+    road("service", (0.001, 0.002), (0.001, 0.003), access="private", foot="yes"),
+    road("steps", (0, 0), (-0.001, 0)),
+    road("residential", (0, 0.003), (0, 0.004), foot="no"),
+    # An isolated fragment right next to the main component.
+    road("service", (0.0005, 0.0005), (0.0005, 0.0006)),
+]
+
+
+@pytest.fixture
+def roads_path(tmp_path):
+    path = tmp_path / "roads.geojson"
+    path.write_text("".join(json.dumps(feature) + "\n" for feature in ROADS), encoding="utf-8")
+    return path
+
+
+def node_at(graph, lat, lon):
+    matches = [u for u in range(graph.node_count) if (graph.lat[u], graph.lon[u]) == (lat, lon)]
+    return matches[0] if matches else None
+
+
+def neighbours(graph, u):
+    return {graph.targets[i]: graph.weights[i] for i in range(graph.offsets[u], graph.offsets[u + 1])}
+
+
+def test_only_intersections_and_way_ends_become_nodes(roads_path):
+    graph = routing.RoadGraph.build(roads_path, "walk")
+
+    assert node_at(graph, 0, 0.001) is None
+    crossing = node_at(graph, 0, 0.002)
+    assert crossing is not None
+    start = node_at(graph, 0, 0)
+    # Edge length is the folded geometry, and the CSR arrays are symmetric.
+    expected = routing.segment_km(0, 0, 0, 0.001) + routing.segment_km(0, 0.001, 0, 0.002)
+    assert neighbours(graph, start)[crossing] == pytest.approx(expected)
+    assert neighbours(graph, crossing)[start] == pytest.approx(expected)
+    assert len(neighbours(graph, crossing)) == 4
+    assert graph.offsets[graph.node_count] == len(graph.targets) == 2 * graph.edge_count
+
+
+@pytest.mark.parametrize(
+    "mode, present, absent",
+    [
+        # service with foot=yes and steps are walkable; motorway and foot=no are not.
+        ("walk", [(0.001, 0.003), (-0.001, 0)], [(0, 0.006), (0, 0.004)]),
+        ("cycle", [(0, 0.004)], [(0.001, 0.003), (-0.001, 0), (0, 0.006)]),
+    ],
+)
+def test_access_and_highway_exclusions(roads_path, mode, present, absent):
+    graph = routing.RoadGraph.build(roads_path, mode)
+    for lat, lon in present:
+        assert node_at(graph, lat, lon) is not None, (lat, lon)
+    for lat, lon in absent:
+        assert node_at(graph, lat, lon) is None, (lat, lon)
+
+
+def test_snap_uses_main_component(roads_path):
+    graph = routing.RoadGraph.build(roads_path, "walk")
+    assert node_at(graph, 0.0005, 0.0005) is not None
+
+    node, offset = graph.snap(0.0005, 0.00055)
+    assert node == node_at(graph, 0, 0)
+    assert offset == pytest.approx(routing.segment_km(0.0005, 0.00055, 0, 0))
+    assert graph.snap(0.05, 0.05) == (None, None)
+
+
+def test_multi_source_and_from_node(roads_path):
+    graph = routing.RoadGraph.build(roads_path, "walk")
+    west, crossing, east = node_at(graph, 0, 0), node_at(graph, 0, 0.002), node_at(graph, 0, 0.003)
+    west_km = neighbours(graph, west)[crossing]
+    east_km = neighbours(graph, crossing)[east]
+
+    dist, label = graph.multi_source([(west, 0.0, "W"), (east, 0.5, "E")])
+    assert (dist[crossing], label[crossing]) == (pytest.approx(west_km), "W")
+    assert (dist[east], label[east]) == (pytest.approx(west_km + east_km), "W")
+    assert label[node_at(graph, 0.0005, 0.0005)] is None
+
+    reached = graph.from_node(west, west_km + east_km)
+    assert reached[east] == pytest.approx(west_km + east_km)
+    assert east not in graph.from_node(west, west_km + east_km - 1e-9)
+
+
+def test_school_pairs_at_pair_km_cutoff(roads_path):
+    graph = routing.RoadGraph.build(roads_path, "walk")
+    west, east = node_at(graph, 0, 0), node_at(graph, 0, 0.003)
+    snapped = {"S1": (west, 0.01), "S2": (east, 0.02), "S3": (node_at(graph, 0.0005, 0.0005), 0.0)}
+    total = 0.01 + graph.from_node(west, 1.0)[east] + 0.02
+
+    pairs = school_pairs(graph, snapped, total)
+    assert sorted(pairs) == [("S1", "S2", round(total, 4)), ("S2", "S1", round(total, 4))]
+    assert school_pairs(graph, snapped, total - 1e-9) == []
+
+
+def test_graph_cache_round_trip(roads_path, tmp_path):
+    graph, built = routing.load_or_build("walk", roads_path, tmp_path / "graph")
+    cached, rebuilt = routing.load_or_build("walk", roads_path, tmp_path / "graph")
+    assert (built, rebuilt) == (True, False)
+    for name in routing.RoadGraph._ARRAYS:
+        assert getattr(cached, name) == getattr(graph, name)
@@ -0,0 +1,212 @@
+import http.client
+import math
+import threading
+from http.server import ThreadingHTTPServer
+
+import duckdb
+import pytest
+
+import gen_synthetic
+import rules
+import server
+
+
+@pytest.fixture(scope="module")
+def synthetic_db(tmp_path_factory):
+    root = tmp_path_factory.mktemp("synthetic")
+    gen_synthetic.generate(str(root / "src"), gen_synthetic.sizes_for(preset="1x"))
+    gen_synthetic.build_database(str(root / "src"), str(root / "data.db"))
+    # The generated schools are all well used; oversize half of them and wear some
+    # down so every rule (close, merge, new_build, resize) fires somewhere.
+    con = duckdb.connect(str(root / "data.db"))
+    con.execute(
+        """
+        UPDATE schools SET capacity_total = capacity_total * 3,
+                           condition_score = CASE WHEN hash(school_id) % 3 = 0 THEN 1 ELSE condition_score END
+        WHERE hash(school_id) % 4 = 0
+        """
+    )
+    con.close()
+    return root / "data.db"
+
+
+@pytest.fixture
+def db(synthetic_db, monkeypatch):
+    monkeypatch.setattr(server, "DB_PATH", synthetic_db)
+    monkeypatch.setattr(server, "_db", None)
+    with server.get_db() as con:
+        con.execute("DELETE FROM school_network_distance")
+        con.execute("DELETE FROM school_network_snap")
+    yield server
+    server._db.close()
+
+
+def haversine_km(lat1, lon1, lat2, lon2):
+    r = 6371.0
+    dlat = math.radians(lat2 - lat1)
+    dlon = math.radians(lon2 - lon1)
+    a = math.sin(dlat / 2) ** 2 + math.cos(math.radians(lat1)) * math.cos(math.radians(lat2)) * math.sin(dlon / 2) ** 2
+    return 2 * r * math.atan2(math.sqrt(a), math.sqrt(1 - a))
+
+
+def reference_recommendations(con, year, scenario):
+    """The hard-coded close/merge/new_build/resize loops the rule table replaced."""
+    class_size, max_distance, min_condition = con.execute(
+        "SELECT class_size_max, max_distance_km, min_condition_score FROM constraints WHERE constraint_id = 'default'"
+    ).fetchone()
+    schools = con.execute(
+        """
+        SELECT s.school_id, s.district_id, s.name, s.x_lon, s.y_lat, s.capacity_total, s.condition_score,
+               su.enrolled_estimate, su.utilization_pct
+        FROM schools s
+        JOIN school_utilization su ON su.school_id = s.school_id AND su.year = ? AND su.scenario_id = ?
+        WHERE s.status = 'active'
+        ORDER BY s.school_id
+        """,
+        [year, scenario],
+    ).fetchall()
+    districts = con.execute(
+        "SELECT district_id, surplus_deficit FROM district_capacity WHERE year = ? AND scenario_id = ?",
+        [year, scenario],
+    ).fetchall()
+
+    recs = []
+    for school_id, district_id, _, _, _, capacity, condition, enrolled, util_pct in schools:
+        if util_pct < 40 and condition < min_condition:
+            reason = f"Låg beläggning ({util_pct:.1f}%) och svagt skick ({condition})."
+            recs.append((district_id, school_id, "close", reason, int(enrolled), -int(capacity)))
+    for i, a in enumerate(schools):
+        for b in schools[i + 1 :]:
+            if a[1] != b[1] or not (a[8] < 55 and b[8] < 55):
+                continue
+            distance = haversine_km(a[4], a[3], b[4], b[3])
+            if distance < max_distance:
+                reason = f"Sammanslagning med {b[2]}: låg beläggning och avstånd {distance:.2f} km."
+                recs.append((a[1], a[0], "merge", reason, int(a[7] + b[7]), -int(min(a[5], b[5]) // 2)))
+    for district_id, surplus_deficit in districts:
+        deficit = abs(surplus_deficit)
+        if surplus_deficit < -(class_size * 4):
+            recs.append((district_id, None, "new_build", f"Kapacitetsunderskott {deficit} elever i distriktet.",
+                         deficit, deficit))
+        elif surplus_deficit < -class_size:
+            recs.append((district_id, None, "resize", f"Mindre underskott {deficit} elever i distriktet.",
+                         deficit, deficit))
+    return sorted(recs, key=str)
+
+
+def stored_recommendations(con, year, scenario):
+    rows = con.execute(
+        """
+        SELECT district_id, school_id, action_type::VARCHAR, reason, impact_students, impact_capacity
+        FROM recommendations WHERE year = ? AND scenario_id = ?
+        """,
+        [year, scenario],
+    ).fetchall()
+    return sorted(rows, key=str)
+
+
+def test_default_rules_match_reference(db):
+    db.build_recommendations()
+    with db.get_db() as con:
+        keys = con.execute("SELECT DISTINCT year, scenario_id::VARCHAR FROM forecast ORDER BY ALL").fetchall()
+        actions = set()
+        for year, scenario in keys:
+            expected = reference_recommendations(con, year, scenario)
+            assert stored_recommendations(con, year, scenario) == expected, (year, scenario)
+            actions.update(rec[2] for rec in expected)
+    assert actions == {"close", "merge", "new_build", "resize"}
+
+
+def test_snapped_pair_without_distance_never_merges(db):
+    with db.get_db() as con:
+        con.execute("INSERT INTO school_network_snap SELECT 'walk', school_id, 0.0, 3.0 FROM schools")
+    db.build_recommendations(2026, "base")
+    with db.get_db() as con:
+        merges = """
+            SELECT school_id, reason FROM recommendations
+            WHERE action_type = 'merge' AND year = 2026 AND scenario_id = 'base'
+        """
+        assert not con.execute(merges).fetchall()
+        a, b = con.execute(
+            """
+            SELECT a.school_id, b.school_id
+            FROM school_utilization a JOIN school_utilization b USING (year, scenario_id)
+            JOIN schools sa ON sa.school_id = a.school_id JOIN schools sb ON sb.school_id = b.school_id
+            WHERE year = 2026 AND scenario_id = 'base' AND sa.district_id = sb.district_id
+              AND a.school_id < b.school_id AND a.utilization_pct < 55 AND b.utilization_pct < 55
+              AND sa.status = 'active' AND sb.status = 'active'
+            ORDER BY ABS(sa.y_lat - sb.y_lat) + ABS(sa.x_lon - sb.x_lon), a.school_id, b.school_id LIMIT 1
+            """
+        ).fetchone()
+        con.execute("INSERT INTO school_network_distance VALUES ('walk', ?, ?, 2.5)", [a, b])
+    db.build_recommendations(2026, "base")
+    with db.get_db() as con:
+        merges = con.execute(merges).fetchall()
+    assert len(merges) == 1 and merges[0][0] == a and merges[0][1].endswith("avstånd 2.50 km.")
+
+
+def test_unknown_constraint_id_is_client_error(db):
+    with pytest.raises(server.ApiError) as exc:
+        db.build_recommendations(2026, "base", "nope")
+    assert exc.value.status == 400
+
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), server.DemoHandler)
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    try:
+        for constraint_id, status in (("default", 200), ("nope", 400)):
+            con = http.client.HTTPConnection(*httpd.server_address, timeout=5)
+            con.request("GET", f"/api/recommendation-rules?constraint_id={constraint_id}")
+            response = con.getresponse()
+            response.read()
+            con.close()
+            assert response.status == status, constraint_id
+    finally:
+        httpd.shutdown()
+        httpd.server_close()
+
+
+def test_compile_reason():
+    assert rules.compile_reason("Skick {condition}", "school") == "'Skick ' || CAST(condition_score AS VARCHAR)"
+    assert rules.compile_reason("{distance_km:.2f} km", "school_pair") == "printf('%.2f', distance_km) || ' km'"
+    assert rules.compile_reason("it's", "district") == "'it''s'"
+
+
+@pytest.mark.parametrize(
+    "template, message",
+    [
+        ("{students}", "Unknown placeholder {students}"),
+        ("{name!r}", "Unknown placeholder {name}"),
+        ("{util_pct:>6}", "Unsupported format spec :>6"),
+        ("{util_pct:.1e}", "Unsupported format spec :.1e"),
+    ],
+)
+def test_compile_reason_rejects(template, message):
+    with pytest.raises(ValueError, match=message.replace("{", r"\{").replace("}", r"\}")):
+        rules.compile_reason(template, "school")
+
+
+def test_compile_rules_rejects_unknown_scope():
+    rule = ("r", "region", "close", 10, None, False, None, "x")
+    with pytest.raises(ValueError, match="Unknown rule scope: region"):
+        rules.compile_rules((rule,), "TRUE")
+
+
+def test_compiled_statement_runs_standalone(synthetic_db):
+    con = duckdb.connect(str(synthetic_db))
+    try:
+        rule_set = rules.load_rules(con, "default")
+        assert [rule[0] for rule in rule_set] == [
+            "close_underused",
+            "merge_nearby",
+            "new_build_deficit",
+            "resize_deficit",
+        ]
+        sql = rules.compile_rules(rule_set, "year = $year")
+        assert rules.compile_rules(rule_set, "year = $year") is sql
+        con.execute("BEGIN TRANSACTION")
+        con.execute("DELETE FROM recommendations")
+        con.execute(sql, {"year": 2026, "constraint_id": "default"})
+        assert con.execute("SELECT COUNT(DISTINCT year) FROM recommendations").fetchone()[0] == 1
+        con.execute("ROLLBACK")
+    finally:
+        con.close()
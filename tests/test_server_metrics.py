@@ -0,0 +1,75 @@
+import http.client
+import threading
+import time
+from collections import Counter
+from http.server import ThreadingHTTPServer
+
+import pytest
+
+import metrics
+import server
+
+
+@pytest.fixture
+def base_url():
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), server.DemoHandler)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield httpd.server_address
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def request(address, method, path):
+    con = http.client.HTTPConnection(*address, timeout=5)
+    try:
+        con.request(method, path)
+        response = con.getresponse()
+        response.read()
+        return response.status
+    finally:
+        con.close()
+
+
+def test_unknown_routes_share_one_label(base_url):
+    statuses = {
+        request(base_url, method, f"/api/scan-{i}")
+        for i, method in enumerate(["GET", "POST", "PATCH", "PUT", "DELETE", "BREW"])
+    }
+    assert {404, 501} <= statuses
+    assert request(base_url, "GET", "/api/health") == 200
+
+    rendered = metrics.render()
+    assert "scan-" not in rendered
+    assert 'route="unknown"' in rendered
+    assert 'route="/api/health"' in rendered
+    assert 'method="BREW"' not in rendered
+
+
+def test_profiler_threshold_is_clamped():
+    profiler = metrics.SlowRequestProfiler()
+    profiler.configure(True, 0)
+    assert profiler.threshold_ms == profiler.MIN_THRESHOLD_MS
+    profiler.configure(False)
+    assert not profiler.enabled
+
+
+def test_profiler_sampler_idles_without_requests():
+    profiler = metrics.SlowRequestProfiler(threshold_ms=100, interval_ms=1)
+    with profiler.sample() as stacks:
+        deadline = time.monotonic() + 2
+        while not stacks and time.monotonic() < deadline:
+            time.sleep(0.005)
+    assert stacks
+    profiler.configure(False)
+    deadline = time.monotonic() + 2
+    while profiler._wake.is_set() and time.monotonic() < deadline:
+        time.sleep(0.005)
+    assert not profiler._wake.is_set()
+    assert profiler._thread.is_alive()
+
+
+def test_profiler_keeps_newest_dumps(tmp_path):
+    profiler = metrics.SlowRequestProfiler(threshold_ms=50, out_dir=tmp_path, max_files=3)
+    paths = [profiler.maybe_dump(Counter({"main;handler": 1}), f"GET /api/r{i}", 1.0) for i in range(5)]
+    assert sorted(tmp_path.iterdir()) == paths[-3:]
@@ -623,7 +623,7 @@ async function refreshPlanning() {
 
 function setupConstraintsSave() {
   qs("saveConstraintsBtn").addEventListener("click", async () => {
-    await api("/api/constraints", {
+    const res = await api("/api/constraints", {
       method: "PATCH",
       headers: { "Content-Type": "application/json" },
       body: JSON.stringify({
@@ -632,6 +632,8 @@ function setupConstraintsSave() {
         min_condition_score: Number(qs("minCondition").value)
       })
     });
+    const { warnings = [] } = await res.json();
+    if (warnings.length) alert(warnings.join("\n"));
     await refreshPlanning();
   });
 }